@@ -0,0 +1,38 @@
+"""Gunicorn configuration, loaded automatically from the working directory.
+
+Set GUNICORN_WORKER_CLASS=gevent to serve the requests with green threads. The standard
+library and psycopg2 are then patched to yield to other requests while waiting on I/O."""
+
+import os
+import shutil
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+# WEB_CONCURRENCY is the variable that gunicorn and the hosting platforms use on their own
+workers = int(os.environ.get('GUNICORN_WORKERS', os.environ.get('WEB_CONCURRENCY', 1)))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+if worker_class == 'gevent':
+    # Patch before the application is imported (--preload) to avoid mixing
+    # the original and the green versions of sockets, locks and threads.
+    from gevent import monkey
+    monkey.patch_all()
+
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+# pylint: disable=wrong-import-position
+from prometheus_client import multiprocess
+
+
+def on_starting(_server):
+    """Clear the metric values left over from the previous run."""
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+
+
+def child_exit(_server, worker):
+    """Stop reporting the live gauges of the exited worker."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
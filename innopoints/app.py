@@ -1,18 +1,19 @@
 """Flask application factory."""
 
-import time
 from importlib import import_module
 import logging
-import logging.config
+import os
 
 from flask import Flask
-from flask_migrate import Migrate, upgrade
+from flask_migrate import Migrate
 from werkzeug.middleware.proxy_fix import ProxyFix
-import psycopg2
-import sqlalchemy.exc
 
 from innopoints.extensions import db, ma, mail, oauth, login_manager, push
 from innopoints.blueprints import all_blueprints
+from innopoints.commands import all_commands
+from innopoints.core.json_encoder import OrjsonEncoder
+from innopoints.core.logs import configure_logging
+from innopoints.core import instrumentation, metrics, slow_queries, timeouts
 
 log = logging.getLogger(__name__)
 
@@ -21,72 +22,43 @@ def create_app(config='config/prod.py'):
     """Create Flask application with given configuration"""
     app = Flask(__name__, static_folder=None)
     app.config.from_pyfile(config)
+    app.json_encoder = OrjsonEncoder
 
     # Import DB models. Flask-SQLAlchemy doesn't do this automatically.
     with app.app_context():
         import_module('innopoints.models')
 
     # Initialize extensions/add-ons/plugins.
+    metrics.init_app(app)
     db.init_app(app)
-    Migrate(app, db)
-    while True:
-        try:
-            with app.app_context():
-                db.engine.connect()
-            break
-        except (RuntimeError, psycopg2.OperationalError, sqlalchemy.exc.OperationalError) as err:
-            log.exception(f'Couldn\'t connect to DB. Error: {err.with_traceback(None)}. retrying..')
-            time.sleep(5)
+    Migrate(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
 
-    with app.app_context():
-        upgrade()
-
-    logging.config.dictConfig({
-        'version': 1,
-        'formatters': {
-            'default': {
-                'datefmt': '%d/%m %H:%M:%S',
-                'format': '[%(asctime)s] [%(levelname)8s] %(message)s (%(name)s:%(lineno)s)',
-            }
-        },
-        'handlers': {
-            'stderr': {
-                'class': 'logging.StreamHandler',
-                'formatter': 'default',
-                'level': 'DEBUG',
-            },
-            'logfile': {
-                'class': 'logging.handlers.TimedRotatingFileHandler',
-                'filename': './innopoints.log',
-                'formatter': 'default',
-                'when': 'W0',  # will start a new file each Monday
-                'backupCount': 5,  # will only keep the 5 latest files,
-                'level': 'ERROR',
-            }
-        },
-        'loggers': {
-            'werkzeug': {
-                'handlers': ['stderr'],
-                'propagate': False,
-            }
-        },
-        'root': {
-            'level': 'DEBUG',
-            'handlers': ['stderr', 'logfile']
-        },
-        'disable_existing_loggers': False,
-    })
+    configure_logging(app)
 
     ma.init_app(app)
     oauth.init_app(app)
+    oauth.register(
+        'innopolis_sso',
+        server_metadata_url=f'{app.config["INNOPOLIS_SSO_BASE"]}'
+                            '/.well-known/openid-configuration',
+        client_kwargs={'scope': 'openid'},
+    )
     login_manager.init_app(app)
     mail.init_app(app)
     push.init_app(app)
+    oauth.load()
+    push.load()
+    instrumentation.init_app(app)
+    slow_queries.init_app(app)
+    timeouts.init_app(app)
 
     for blueprint in all_blueprints:
         import_module(blueprint.import_name)
         app.register_blueprint(blueprint)
 
+    for command in all_commands:
+        app.cli.add_command(command)
+
     # Needed when running behind Nginx under Docker for authorization
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_host=1)
     return app
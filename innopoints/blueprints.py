@@ -27,5 +27,6 @@ api = _factory('api', url_prefix='/api/v1')
 api.before_request(csrf_protect)
 api.before_request(require_json)
 auth = _factory('auth')
+service = _factory('service')
 
-all_blueprints = (api, auth)
+all_blueprints = (api, auth, service)
@@ -0,0 +1,140 @@
+"""Flask CLI commands for the one-shot maintenance tasks.
+
+- flask migrate
+- flask import-legacy
+- flask checkpoint-balances
+"""
+
+import io
+import logging
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+import sqlalchemy.exc
+
+from innopoints.core.timezone import tz_aware_now
+from innopoints.extensions import db
+
+log = logging.getLogger(__name__)
+
+# An arbitrary key for the PostgreSQL advisory lock guarding the migrations
+MIGRATION_LOCK_ID = 0x1AA0_B01A
+# The transactions are timestamped before they are committed, so a checkpoint is only made
+# for a moment far enough in the past for all of its transactions to have been committed
+CHECKPOINT_DELAY = timedelta(hours=1)
+# The characters escaped in the text format of COPY
+COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+COPY_TEXT_NULL = '\\N'
+
+
+def copy_text_row(row) -> str:
+    """Format the row as a line in the text format of COPY."""
+    return '\t'.join(COPY_TEXT_NULL if value is None else str(value).translate(COPY_TEXT_ESCAPES)
+                     for value in row) + '\n'
+
+
+def wait_for_database(timeout: float, interval: float = 2):
+    """Block until the database accepts connections or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with db.engine.connect() as connection:
+                connection.execute(db.text('SELECT 1'))
+            return
+        except sqlalchemy.exc.OperationalError as err:
+            if time.monotonic() >= deadline:
+                raise click.ClickException(f'The database is unreachable: {err.orig}')
+            log.warning('Couldn\'t connect to the database, retrying in %ss..', interval)
+            time.sleep(interval)
+
+
+@click.command('migrate')
+@click.option('--timeout', default=60, show_default=True,
+              help='Seconds to wait for the database to come up.')
+@with_appcontext
+def migrate_command(timeout):
+    """Wait for the database and apply the pending migrations.
+
+    Concurrent runs are serialized with a transaction-level advisory lock (which also
+    works through PgBouncer), so it is safe to start the command from several containers."""
+    from flask_migrate import upgrade  # pylint: disable=import-outside-toplevel
+
+    wait_for_database(timeout)
+    with db.engine.connect() as connection, connection.begin():
+        connection.execute(db.select([db.func.pg_advisory_xact_lock(MIGRATION_LOCK_ID)]))
+        upgrade()
+
+
+@click.command('import-legacy')
+@click.argument('path', default='db.sqlite3',
+                type=click.Path(exists=True, dir_okay=False))
+@click.option('--replace', is_flag=True,
+              help='Discard the previously imported accounts.')
+@with_appcontext
+def import_legacy_command(path, replace):
+    """Load the accounts of the old innopoints system from its SQLite database.
+
+    The rows are streamed into the legacy_accounts table with COPY in a single transaction,
+    in the text format, where a NULL is written as \\N and an empty string stays empty.
+    The accounts are deleted from the table as they are reclaimed, so importing on top of
+    an earlier import would let their points be reclaimed again, unless --replace is given."""
+    buffer = io.StringIO()
+    imported = 0
+    source = sqlite3.connect(path)
+    try:
+        rows = source.execute('SELECT email, username, password, points FROM User;')
+        for row in rows:
+            buffer.write(copy_text_row(row))
+            imported += 1
+    except sqlite3.Error as err:
+        raise click.ClickException(f'Could not read the legacy accounts: {err}')
+    finally:
+        source.close()
+    buffer.seek(0)
+
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('LOCK TABLE legacy_accounts IN EXCLUSIVE MODE')
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM legacy_accounts)')
+        if cursor.fetchone()[0]:
+            if not replace:
+                raise click.ClickException('The legacy accounts have already been imported, '
+                                           'pass --replace to discard them.')
+            cursor.execute('TRUNCATE legacy_accounts')
+        cursor.copy_expert('COPY legacy_accounts (email, username, password, points) '
+                           f"FROM STDIN WITH (FORMAT text, NULL '{COPY_TEXT_NULL}')", buffer)
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    click.echo(f'Imported {imported} legacy accounts.')
+
+
+@click.command('checkpoint-balances')
+@click.option('--at', 'moment', type=datetime.fromisoformat,
+              help='The moment in ISO format with timezone, an hour ago by default.')
+@with_appcontext
+def checkpoint_balances_command(moment):
+    """Store the balances of all the accounts as of the given moment,
+    so that the balance lookups at later moments can start from them.
+    Meant to be run periodically, e.g. nightly or at the end of each semester."""
+    from innopoints.core.ledger import make_checkpoints  # pylint: disable=import-outside-toplevel
+
+    if moment is None:
+        moment = tz_aware_now() - CHECKPOINT_DELAY
+    elif moment.tzinfo is None:
+        raise click.BadParameter('The timezone must be passed.', param_hint='--at')
+
+    created = make_checkpoints(moment)
+    db.session.commit()
+    click.echo(f'Made {created} balance checkpoint(s) as of {moment.isoformat()}.')
+
+
+all_commands = (migrate_command, import_legacy_command, checkpoint_balances_command)
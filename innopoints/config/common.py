@@ -5,18 +5,74 @@ import os
 
 SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# A gevent worker serves many requests at once, each may hold a connection
+_GREEN_WORKER = os.environ.get('GUNICORN_WORKER_CLASS') == 'gevent'
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 20 if _GREEN_WORKER else 5)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20 if _GREEN_WORKER else 10)),
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'on') == 'on',
+}
+# Milliseconds, 0 disables the limit. Views may set their own with @statement_timeout
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))
+# Connecting through PgBouncer in transaction pooling mode, where the server connection
+# changes between transactions. The timeout is then set per transaction, not per connection.
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', 'off') == 'on'
+if DB_STATEMENT_TIMEOUT and not DB_PGBOUNCER:
+    SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = {
+        'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}',
+    }
+
+# Reads of the replica-safe views go to the replica, if there is one
+if 'DATABASE_REPLICA_URL' in os.environ:
+    SQLALCHEMY_BINDS = {'replica': os.environ['DATABASE_REPLICA_URL']}
+# Seconds to keep reading from the primary after a write, while the replica catches up
+REPLICA_LAG_WINDOW = int(os.environ.get('REPLICA_LAG_WINDOW', 5))
+
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024
 
+# 'marshmallow' or 'sql' (the database builds the JSON for the project and product listings)
+LISTING_RENDERER = os.environ.get('LISTING_RENDERER', 'marshmallow')
+
+# Report the DB, serialization and file I/O timings in the Server-Timing response header.
+# Every client gets to see it, so it's off unless asked for outside development.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'off') == 'on'
+# Log the SQL statements of the requests that run more queries than this
+SQL_QUERY_LOG_THRESHOLD = int(os.environ.get('SQL_QUERY_LOG_THRESHOLD', 30))
+
+# The bearer token that the Prometheus scraper passes to /metrics (not exposed if unset)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Record the statements that take longer than this many milliseconds (disabled if unset)
+SLOW_QUERY_THRESHOLD = (int(os.environ['SLOW_QUERY_THRESHOLD'])
+                        if 'SLOW_QUERY_THRESHOLD' in os.environ else None)
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_RATE', 0.1))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 100))
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# 'json' (one object per line) or 'text'
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+
+# Seconds to reuse the loaded user's account without querying it again, 0 disables.
+# It is also how long the other worker processes may see an outdated account (e.g. admin flag)
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 10))
+
 SESSION_COOKIE_HTTPONLY = True
 REMEMBER_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 REMEMBER_COOKIE_SAMESITE = 'Lax'
 
+INNOPOLIS_SSO_BASE = os.environ.get('INNOPOLIS_SSO_BASE')
+
 MAIL_SERVER = 'mail.innopolis.ru'
 MAIL_PORT = 587
 MAIL_USERNAME = 'innopoints@innopolis.university'
 MAIL_PASSWORD = os.environ['MAIL_PASSWORD']
 MAIL_DEFAULT_SENDER = MAIL_USERNAME
 MAIL_USE_TLS = True
+# The threads that send the emails and the push notifications in the background
+MAIL_SENDER_THREADS = int(os.environ.get('MAIL_SENDER_THREADS', 4))
 WEBPUSH_VAPID_PRIVATE_KEY = os.environ.get('WEBPUSH_VAPID_PRIVATE_KEY')
 WEBPUSH_SENDER_INFO = os.environ.get('WEBPUSH_SENDER_INFO')
@@ -11,4 +11,8 @@ INNOPOLIS_SSO_CLIENT_SECRET = os.getenv('INNOPOLIS_SSO_CLIENT_SECRET')
 
 JSON_SORT_KEYS = False
 
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'on') == 'on'
+
 FRONTEND_BASE = 'http://0.0.0.0:3000'
@@ -0,0 +1,106 @@
+"""Sparse fieldsets requested with the `?fields=` query parameter.
+
+The client passes a comma-separated list of field names, using dots to reach into nested
+objects (e.g. `?fields=id,name,activities.name`). The list is turned into the `only` option
+for the Marshmallow schema and into SQLAlchemy loader options, so that the columns and
+relationships that were not requested are never fetched."""
+
+from typing import Dict, List, Optional, Tuple
+
+from flask import request
+from marshmallow import class_registry, fields as ma_fields
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+from sqlalchemy.orm.interfaces import MANYTOONE
+
+from innopoints.core.helpers import abort
+
+
+# Columns that are read by the computed properties of the models.
+PROPERTY_DEPENDENCIES = {
+    ('activities', 'vacant_spots'): ('people_required',),
+}
+
+
+def _field_tree(fields) -> Dict[str, dict]:
+    """Turn a list of dotted field names into a nested dictionary."""
+    tree = {}
+    for field in fields:
+        node = tree
+        for part in field.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _nested_schema(field):
+    """Return the schema class that a Nested field refers to or None for other fields."""
+    if not isinstance(field, ma_fields.Nested):
+        return None
+    nested = field.nested
+    if isinstance(nested, str):
+        return class_registry.get_class(nested)
+    if isinstance(nested, type):
+        return nested
+    return type(nested)
+
+
+def _validate(schema, tree: Dict[str, dict], prefix=''):
+    """Abort with 400 if the tree mentions fields that don't exist on the schema."""
+    for name, subtree in tree.items():
+        field = schema._declared_fields.get(name)  # pylint: disable=protected-access
+        if field is None:
+            abort(400, {'message': f'Unknown field "{prefix}{name}".'})
+        if subtree:
+            nested_schema = _nested_schema(field)
+            if nested_schema is None:
+                abort(400, {'message': f'The field "{prefix}{name}" has no subfields.'})
+            _validate(nested_schema, subtree, prefix=f'{prefix}{name}.')
+
+
+def requested_fields(schema) -> Optional[Tuple[str, ...]]:
+    """Return the validated field names from the `fields` query parameter
+    or None if the client did not limit the fields."""
+    raw_fields = request.args.get('fields')
+    if raw_fields is None:
+        return None
+
+    fields = tuple(field.strip() for field in raw_fields.split(',') if field.strip())
+    if not fields:
+        abort(400, {'message': 'At least one field must be requested.'})
+
+    _validate(schema, _field_tree(fields))
+    return fields
+
+
+def _loader_options(mapper, tree: Dict[str, dict], loader=None) -> List:
+    """Recursively build the loader options for the entity described by the mapper."""
+    columns = {mapper.get_property_by_column(column).key for column in mapper.primary_key}
+    relationships = []
+    for name, subtree in tree.items():
+        if name in mapper.column_attrs:
+            columns.add(name)
+        elif name in mapper.relationships:
+            relationship = mapper.relationships[name]
+            if relationship.direction is MANYTOONE:
+                columns.update(mapper.get_property_by_column(column).key
+                               for column in relationship.local_columns)
+            relationships.append((relationship, subtree))
+        else:
+            columns.update(PROPERTY_DEPENDENCIES.get((mapper.local_table.name, name), ()))
+
+    options = [load_only(*columns) if loader is None else loader.load_only(*columns)]
+    for relationship, subtree in relationships:
+        related_loader = (selectinload(relationship.class_attribute) if loader is None
+                          else loader.selectinload(relationship.class_attribute))
+        if subtree:
+            options.extend(_loader_options(relationship.mapper, subtree, related_loader))
+        else:
+            options.append(related_loader)
+    return options
+
+
+def loader_options(model, fields) -> List:
+    """Return the SQLAlchemy loader options that fetch only the requested fields of the model."""
+    if fields is None:
+        return []
+    return _loader_options(inspect(model), _field_tree(fields))
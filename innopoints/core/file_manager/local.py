@@ -1,11 +1,15 @@
 """Manages static files. This particular module uses local file system to store files."""
 
 import os
-from typing import Union
+from typing import Union, TYPE_CHECKING
 
-from PIL import Image
 from werkzeug.datastructures import FileStorage
 
+from innopoints.core.instrumentation import timed
+
+if TYPE_CHECKING:
+    from PIL import Image
+
 
 class FileManagerLocal:
     """Implementation of the file manager using local file system."""
@@ -18,6 +22,7 @@ class FileManagerLocal:
         """Helper function to join path to base and normalize it according to OS."""
         return os.path.normpath(os.path.join(self.base_path, *paths))
 
+    @timed('file')
     def retrieve(self, handle: str) -> bytes:
         """Get the file with given handle."""
         path = self._join_base(handle)
@@ -26,14 +31,16 @@ class FileManagerLocal:
         file = open(path, 'rb')
         return file.read()
 
-    def store(self, file: Union[FileStorage, Image.Image], handle: str):
+    @timed('file')
+    def store(self, file: Union[FileStorage, 'Image.Image'], handle: str):
         """Upload the given file with the handle."""
         filename = self._join_base(handle)
-        if isinstance(file, Image.Image):
-            file.save(filename, format='WebP', quality=100)
-        else:
+        if isinstance(file, FileStorage):
             file.save(filename)
+        else:
+            file.save(filename, format='WebP', quality=100)
 
+    @timed('file')
     def delete(self, handle: str):
         """Delete the file with a given handle."""
         filename = self._join_base(handle)
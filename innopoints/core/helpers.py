@@ -11,6 +11,7 @@ from werkzeug.routing import NotFound
 
 BODY_METHODS = ('POST', 'PATCH')
 MODIFYING_METHODS = ('POST', 'PATCH', 'DELETE')
+LIKE_ESCAPE = '/'
 
 
 def abort(http_code: int, message=None):
@@ -63,3 +64,8 @@ def admin_required(view):
             abort(403)
         return view(*args, **kwargs)
     return login_required(permission_checked)
+
+
+def escape_like(value: str) -> str:
+    """Escape the wildcards of a LIKE pattern, to be used with `escape=LIKE_ESCAPE`."""
+    return value.replace('/', '//').replace('%', '/%').replace('_', '/_')
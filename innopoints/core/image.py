@@ -1,8 +1,13 @@
-"""Image manipulation."""
+"""Image manipulation.
 
-from typing import Dict
+Pillow is only imported for type checking, the images come from the callers."""
 
-from PIL import Image
+from __future__ import annotations
+
+from typing import Dict, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image
 
 from innopoints.core.helpers import abort
 
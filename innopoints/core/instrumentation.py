@@ -0,0 +1,115 @@
+"""Per-request instrumentation of the time spent in the database, serialization and file I/O.
+
+The measurements are reported in an access log line for every request and, if SERVER_TIMING
+is enabled (by default only in development), in the `Server-Timing` response header.
+Requests that run more SQL statements than SQL_QUERY_LOG_THRESHOLD have their statements
+logged to help hunt down N+1 query patterns."""
+
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+log = logging.getLogger(__name__)
+access_log = logging.getLogger('innopoints.access')
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the time spent inside the block to the given phase of the current request.
+    May be used as a decorator. Nested blocks of the same phase are only counted once."""
+    if not has_request_context() or 'timings' not in g or phase in g.active_phases:
+        yield
+        return
+
+    g.active_phases.add(phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.timings[phase] += time.perf_counter() - start
+        g.active_phases.discard(phase)
+
+
+def _before_cursor_execute(conn, _cursor, _statement, _parameters, _context, _executemany):
+    """Remember the time the statement was sent to the database."""
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, _cursor, statement, _parameters, _context, _executemany):
+    """Count the statement and its duration towards the current request."""
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    if has_request_context() and 'timings' in g:
+        g.timings['db'] += elapsed
+        g.statements.append(statement)
+
+
+def _handle_error(context):
+    """Forget the start time of the statement that failed, so it isn't left on the stack."""
+    if context.connection is not None and context.execution_context is not None:
+        start_times = context.connection.info.get('query_start_time')
+        if start_times:
+            start_times.pop()
+
+
+def _start_request():
+    """Prepare the counters for the request."""
+    g.request_start_time = time.perf_counter()
+    g.timings = defaultdict(float)
+    g.active_phases = set()
+    g.statements = []
+
+
+def _milliseconds(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def _finish_request(response):
+    """Report the measurements of the request."""
+    if 'timings' not in g:
+        return response
+
+    total = time.perf_counter() - g.request_start_time
+    query_count = len(g.statements)
+
+    if current_app.config.get('SERVER_TIMING'):
+        metrics = [f'db;dur={_milliseconds(g.timings["db"])};desc="{query_count} queries"']
+        metrics.extend(f'{phase};dur={_milliseconds(duration)}'
+                       for (phase, duration) in g.timings.items() if phase != 'db')
+        metrics.append(f'total;dur={_milliseconds(total)}')
+        response.headers.add('Server-Timing', ', '.join(metrics))
+
+    access_log.info('%s %s %s %sms', request.method, request.full_path.rstrip('?'),
+                    response.status_code, _milliseconds(total), extra={
+                        'method': request.method,
+                        'path': request.path,
+                        'endpoint': request.endpoint,
+                        'status': response.status_code,
+                        'duration_ms': _milliseconds(total),
+                        'queries': query_count,
+                        **{f'{phase}_ms': _milliseconds(duration)
+                           for (phase, duration) in g.timings.items()},
+                    })
+
+    threshold = current_app.config.get('SQL_QUERY_LOG_THRESHOLD')
+    if threshold is not None and query_count > threshold:
+        log.warning('%s %s ran %d SQL statements:\n%s', request.method, request.path,
+                    query_count, '\n'.join(g.statements))
+
+    return response
+
+
+def init_app(app):
+    """Register the database event listeners and the request hooks."""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
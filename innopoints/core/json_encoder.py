@@ -0,0 +1,37 @@
+"""A faster drop-in replacement for the default Flask JSON encoder.
+
+Flask hands the encoding over to `app.json_encoder`, which is used by both `flask.jsonify`
+and `schema.jsonify` of Flask-Marshmallow. This encoder delegates the work to orjson."""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import orjson
+from flask.json import JSONEncoder
+from werkzeug.http import http_date
+
+
+class OrjsonEncoder(JSONEncoder):
+    """Serializes the objects with orjson, keeping the output of the Flask encoder.
+
+    Dates are still formatted as RFC 822 strings, decimals become floats.
+    Indentation is limited to two spaces, custom separators are ignored."""
+
+    def encode(self, o):
+        """Return a JSON string representation of a Python object."""
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent is not None:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(o, default=self.default, option=option).decode()
+
+    def default(self, o):
+        """Convert the types orjson does not handle in the same way as Flask."""
+        if isinstance(o, datetime):
+            return http_date(o.utctimetuple())
+        if isinstance(o, date):
+            return http_date(o.timetuple())
+        if isinstance(o, Decimal):
+            return float(o)
+        return super().default(o)
@@ -0,0 +1,78 @@
+"""Balances of the accounts at a point in time.
+
+A balance is the latest checkpoint of the account made before the moment plus the
+transactions made between the checkpoint and the moment. The checkpoints are made
+periodically with `flask checkpoint-balances`, so only a short stretch of the ledger
+has to be summed up. When a transaction is deleted (e.g. of a rejected purchase),
+the checkpoints made after it are dropped, so the later balances are summed up
+from the earlier ones."""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from innopoints.extensions import db
+from innopoints.models import Account, BalanceCheckpoint, Transaction
+
+
+def balances_as_of(moment: datetime, email: Optional[str] = None):
+    """Build the query of the balances of the accounts at the given moment,
+    with the `account_email` and `balance` columns.
+
+    For each account the latest checkpoint and the sum of the later transactions are
+    looked up in LATERAL subqueries, so the index on the account and time of the transactions
+    limits the scan to the transactions made since the checkpoint.
+
+    Pass the e-mail to only query the balance of that account, otherwise the query
+    can be joined to by the statistics."""
+    accounts = select([Account.email])
+    if email is not None:
+        accounts = accounts.where(Account.email == email)
+    accounts = accounts.alias('balance_accounts')
+
+    # pylint: disable=bad-continuation
+    checkpoint = (
+        select([BalanceCheckpoint.time, BalanceCheckpoint.balance])
+            .where(BalanceCheckpoint.account_email == accounts.c.email)
+            .where(BalanceCheckpoint.time <= moment)
+            .order_by(BalanceCheckpoint.time.desc())
+            .limit(1)
+    ).lateral('checkpoint')
+    since = db.func.coalesce(checkpoint.c.time, db.cast('-infinity', db.DateTime(timezone=True)))
+    delta = (
+        select([db.func.sum(Transaction.change).label('change')])
+            .where(Transaction.account_email == accounts.c.email)
+            .where(Transaction.time > since)
+            .where(Transaction.time <= moment)
+    ).lateral('delta')
+
+    return (
+        select([accounts.c.email.label('account_email'),
+                (db.func.coalesce(checkpoint.c.balance, 0)
+                 + db.func.coalesce(delta.c.change, 0)).label('balance')])
+            .select_from(accounts
+                .outerjoin(checkpoint, db.true())
+                .outerjoin(delta, db.true()))
+    )
+
+
+def balance_as_of(email: str, moment: datetime) -> int:
+    """Return the balance of the account at the given moment."""
+    balances = balances_as_of(moment, email).alias('balances')
+    return db.session.execute(select([balances.c.balance])).scalar() or 0
+
+
+def make_checkpoints(moment: datetime) -> int:
+    """Store the balances of all the accounts at the given moment as checkpoints.
+    Return the number of the new checkpoints."""
+    balances = balances_as_of(moment).alias('balances')
+    result = db.session.execute(
+        insert(BalanceCheckpoint.__table__).from_select(
+            ['account_email', 'time', 'balance'],
+            select([balances.c.account_email, db.literal(moment), balances.c.balance]),
+        ).on_conflict_do_nothing()
+    )
+    return result.rowcount
+
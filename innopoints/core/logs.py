@@ -0,0 +1,114 @@
+"""Logging configuration.
+
+The request threads only put the records into a queue; a background listener thread
+formats them and writes them out, so slow output never blocks a request. The records
+are formatted as JSON lines (LOG_FORMAT = 'json') or as text (LOG_FORMAT = 'text').
+The level comes from the LOG_LEVEL setting, so the arguments of the messages below it
+are never even formatted."""
+
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
+
+import orjson
+
+
+# The attributes every record has, anything else was passed with `extra`
+STANDARD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime',
+}
+
+_queue_handler = None
+_handlers = ()
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats the records as single-line JSON objects, including the `extra` fields."""
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'location': f'{record.module}:{record.lineno}',
+        }
+        entry.update((key, value) for (key, value) in vars(record).items()
+                     if key not in STANDARD_ATTRIBUTES)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class PreparedQueueHandler(logging.handlers.QueueHandler):
+    """Puts the records into the queue with the message and the traceback already rendered,
+    so the listener never touches the objects passed as arguments (e.g. ORM instances)."""
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _stop_listener():
+    """Write out the remaining records and stop the listener thread."""
+    if _listener is not None:
+        _listener.stop()
+
+
+def _start_listener():
+    """Start a listener writing the queued records to the handlers."""
+    global _listener  # pylint: disable=global-statement,invalid-name
+    _stop_listener()
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *_handlers,
+                                               respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_listener_in_child():
+    """Threads don't survive a fork, so each gunicorn worker needs its own listener."""
+    global _listener  # pylint: disable=global-statement,invalid-name
+    _listener = None
+    _start_listener()
+
+
+def configure_logging(app):
+    """Route the log records through the queue to stderr and the error log file."""
+    global _queue_handler, _handlers  # pylint: disable=global-statement,invalid-name
+    if app.config['LOG_FORMAT'] == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '[%(asctime)s] [%(levelname)8s] %(message)s (%(name)s:%(lineno)s)',
+            datefmt='%d/%m %H:%M:%S',
+        )
+
+    stderr = logging.StreamHandler()
+    stderr.setFormatter(formatter)
+    logfile = logging.handlers.TimedRotatingFileHandler(
+        './innopoints.log',
+        when='W0',  # will start a new file each Monday
+        backupCount=5,  # will only keep the 5 latest files
+    )
+    logfile.setFormatter(formatter)
+    logfile.setLevel(logging.ERROR)
+    _handlers = (stderr, logfile)
+
+    if _queue_handler is None:
+        _queue_handler = PreparedQueueHandler(queue.SimpleQueue())
+        os.register_at_fork(after_in_child=_restart_listener_in_child)
+        atexit.register(_stop_listener)
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(app.config['LOG_LEVEL'])
+    _start_listener()
@@ -0,0 +1,104 @@
+"""Application metrics in the Prometheus format.
+
+When running under gunicorn, every worker is a separate process with its own metric values.
+Set the PROMETHEUS_MULTIPROC_DIR environment variable to a writable directory for the
+workers to share their values through it, the exporter then aggregates them on scrape."""
+
+import os
+import time
+
+from flask import g, request
+from prometheus_client import (
+    CollectorRegistry,
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    generate_latest,
+    Histogram,
+    REGISTRY,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+from sqlalchemy.pool import QueuePool
+
+
+REQUEST_LATENCY = Histogram('innopoints_request_duration_seconds',
+                            'Time spent processing a request.',
+                            ['method', 'endpoint'])
+REQUEST_COUNT = Counter('innopoints_requests_total',
+                        'Number of processed requests.',
+                        ['method', 'endpoint', 'status'])
+
+POOL_CHECKOUT_WAIT = Histogram('innopoints_db_pool_checkout_wait_seconds',
+                               'Time spent waiting for a database connection from the pool.',
+                               buckets=(.001, .005, .01, .05, .1, .5, 1, 5, 10, 30))
+POOL_OVERFLOW = Gauge('innopoints_db_pool_overflow',
+                      'Number of connections opened over the size of the pool.',
+                      multiprocess_mode='livesum')
+POOL_CHECKED_OUT = Gauge('innopoints_db_pool_checked_out',
+                         'Number of connections currently in use.',
+                         multiprocess_mode='livesum')
+
+MAIL_QUEUE_DEPTH = Gauge('innopoints_mail_queue_depth',
+                         'Number of emails waiting to be sent.',
+                         multiprocess_mode='livesum')
+NOTIFICATION_LATENCY = Histogram('innopoints_notification_send_seconds',
+                                 'Time spent delivering a notification.',
+                                 ['channel'])
+NOTIFICATION_FAILURES = Counter('innopoints_notification_failures_total',
+                                'Number of notifications that failed to be delivered.',
+                                ['channel'])
+
+IMAGE_PROCESSING = Histogram('innopoints_image_processing_seconds',
+                             'Time spent cropping and shrinking uploaded images.')
+
+
+class TimedQueuePool(QueuePool):
+    """A connection pool that reports the checkout wait time and its usage."""
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+            self._report_usage()
+
+    def _do_return_conn(self, conn):
+        super()._do_return_conn(conn)
+        self._report_usage()
+
+    def _report_usage(self):
+        POOL_OVERFLOW.set(max(self.overflow(), 0))
+        POOL_CHECKED_OUT.set(self.checkedout())
+
+
+def _start_request():
+    g.metrics_start_time = time.perf_counter()
+
+
+def _finish_request(response):
+    if 'metrics_start_time' in g:
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.labels(request.method, endpoint).observe(
+            time.perf_counter() - g.metrics_start_time
+        )
+        REQUEST_COUNT.labels(request.method, endpoint, response.status_code).inc()
+    return response
+
+
+def export():
+    """Return the current metric values in the Prometheus text format and its content type."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_app(app):
+    """Register the request hooks and the instrumented connection pool.
+    Must be called before the database engine is created."""
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {}).setdefault('poolclass', TimedQueuePool)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
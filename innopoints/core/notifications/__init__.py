@@ -1,29 +1,50 @@
 """Helper module for sending notifications, depending on the user preference"""
 
 import logging
-import threading
-from typing import Sequence
+from collections import defaultdict
+from typing import Optional, Sequence, Tuple
 
-from flask import copy_current_request_context
 from flask_mail import Message
 from sqlalchemy.exc import IntegrityError
 
+from innopoints.core.metrics import MAIL_QUEUE_DEPTH, NOTIFICATION_FAILURES, NOTIFICATION_LATENCY
 from innopoints.extensions import db, mail
-from innopoints.models import Notification, NotificationType, Account, type_to_group
+from innopoints.models import (
+    Notification,
+    NotificationType,
+    Account,
+    PushSubscription,
+    type_to_group,
+)
 from .content import get_content, Link
+from .executor import submit
 from .push import push
 
 log = logging.getLogger(__name__)
 
 
-def notify(recipient_email: str, notification_type: NotificationType, payload=None):
-    """Sends a notification to the specified user."""
-    notification_group = type_to_group[notification_type]
-    channel = db.session.query(
-        # pylint: disable=unsubscriptable-object
-        Account.notification_settings[notification_group]
-    ).filter_by(email=recipient_email).scalar()
+def _send_mail(message):
+    """Send the email, recording the outcome."""
+    try:
+        with NOTIFICATION_LATENCY.labels('email').time():
+            mail.send(message)
+    except Exception as exc:  # pylint: disable=broad-except
+        NOTIFICATION_FAILURES.labels('email').inc()
+        log.exception(exc)
+    finally:
+        MAIL_QUEUE_DEPTH.dec()
+
+
+def send_mail_async(message):
+    """Queue the email to be sent by the background sender threads."""
+    MAIL_QUEUE_DEPTH.inc()
+    submit(_send_mail, message)
 
+
+def _deliver(recipient_email: str, channel, notification_type: NotificationType, payload=None,
+             subscriptions=None):
+    """Send the notification through the channel the user has chosen for it.
+    The push subscriptions of the user are looked up unless they are given."""
     if channel == 'email':
         message_content = get_content(notification_type, payload)
         body = ''.join(map(str, message_content['body']))
@@ -34,15 +55,21 @@ def notify(recipient_email: str, notification_type: NotificationType, payload=No
                               html=email_template.read().format(header=message_content['title'],
                                                                 body=body))
 
-        @copy_current_request_context
-        def send_mail_async(message):
-            mail.send(message)
-
-        mail_thread = threading.Thread(name='mail_sender', target=send_mail_async, args=(message,))
-        mail_thread.start()
-        log.info(f'Sent an email to {recipient_email}')
+        send_mail_async(message)
+        log.info('Sent an email to %s', recipient_email)
     elif channel == 'push':
-        push(recipient_email, notification_type, payload)
+        push(recipient_email, notification_type, payload, subscriptions)
+
+
+def notify(recipient_email: str, notification_type: NotificationType, payload=None):
+    """Sends a notification to the specified user."""
+    notification_group = type_to_group[notification_type]
+    channel = db.session.query(
+        # pylint: disable=unsubscriptable-object
+        Account.notification_settings[notification_group]
+    ).filter_by(email=recipient_email).scalar()
+
+    _deliver(recipient_email, channel, notification_type, payload)
 
     notification = Notification(
         recipient_email=recipient_email,
@@ -53,7 +80,7 @@ def notify(recipient_email: str, notification_type: NotificationType, payload=No
     try:
         db.session.add(notification)
         db.session.commit()
-        log.info(f'Sent a notification to {recipient_email}')
+        log.info('Sent a notification to %s', recipient_email)
         return notification
     except IntegrityError as exc:
         db.session.rollback()
@@ -61,6 +88,48 @@ def notify(recipient_email: str, notification_type: NotificationType, payload=No
         return None
 
 
+def notify_each(notification_type: NotificationType,
+                recipient_payloads: Sequence[Tuple[str, Optional[dict]]]):
+    """Sends a notification of the same type to each of the recipients with their own payload.
+    The preferences and the push subscriptions of all the recipients are read in one query each
+    and the notifications are stored with a single commit."""
+    if not recipient_payloads:
+        return []
+
+    notification_group = type_to_group[notification_type]
+    channels = dict(db.session.query(
+        # pylint: disable=unsubscriptable-object
+        Account.email, Account.notification_settings[notification_group]
+    ).filter(Account.email.in_({email for (email, _payload) in recipient_payloads})))
+
+    subscriptions = defaultdict(list)
+    push_recipients = {email for (email, channel) in channels.items() if channel == 'push'}
+    if push_recipients:
+        for subscription in PushSubscription.query.filter(
+                PushSubscription.account_email.in_(push_recipients)):
+            subscriptions[subscription.account_email].append(subscription)
+
+    notifications = []
+    for recipient_email, payload in recipient_payloads:
+        _deliver(recipient_email, channels.get(recipient_email), notification_type, payload,
+                 subscriptions[recipient_email])
+        notifications.append(Notification(
+            recipient_email=recipient_email,
+            type=notification_type,
+            payload=payload,
+        ))
+
+    try:
+        db.session.add_all(notifications)
+        db.session.commit()
+        log.info('Sent %d notification(s)', len(notifications))
+        return notifications
+    except IntegrityError as exc:
+        db.session.rollback()
+        log.exception(exc)
+        return []
+
+
 def notify_all(recipients: Sequence[Account], notification_type: str, payload=None):
     """Sends the same notification to each of the emails in the given list."""
     for recipient in recipients:
@@ -79,7 +148,7 @@ def remove_notifications(payload: dict):
         deleted += query.delete(synchronize_session=False)
     try:
         db.session.commit()
-        log.debug(f'Deleted {deleted} notification(s) matching "{payload}"')
+        log.debug('Deleted %d notification(s) matching "%s"', deleted, payload)
     except IntegrityError as exc:
         db.session.rollback()
         log.exception(exc)
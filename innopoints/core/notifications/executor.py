@@ -0,0 +1,33 @@
+"""A bounded pool of threads (green threads when running under gevent)
+that sends the emails and push notifications outside of the request."""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+
+log = logging.getLogger(__name__)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run(app, function, args):
+    """Call the function within the application context, logging the failures."""
+    try:
+        with app.app_context():
+            function(*args)
+    except Exception as exc:  # pylint: disable=broad-except
+        log.exception(exc)
+
+
+def submit(function, *args):
+    """Queue the function to be called with the arguments by one of the sender threads."""
+    global _executor  # pylint: disable=global-statement,invalid-name
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(current_app.config['MAIL_SENDER_THREADS'],
+                                           thread_name_prefix='notification_sender')
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    _executor.submit(_run, app, function, args)
@@ -2,16 +2,19 @@
 
 import logging
 
-from pywebpush import WebPushException
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
 
+from innopoints.core.metrics import NOTIFICATION_FAILURES, NOTIFICATION_LATENCY
 from innopoints.extensions import push as webpush, db
-from innopoints.models import NotificationType, Account
+from innopoints.models import NotificationType, PushSubscription
 from .content import get_content, Link
+from .executor import submit
 
 
 log = logging.getLogger(__name__)
+# The push service responds with these when the subscription has expired or been revoked
+GONE_STATUSES = (404, 410)
 
 
 def remove_links(fragment):
@@ -21,11 +24,43 @@ def remove_links(fragment):
     return fragment
 
 
-def push(recipient_email: str, notification_type: NotificationType, payload=None):
-    '''Sends a notification to the specified user.'''
-    subscriptions = Account.query.get(recipient_email).notification_settings.get('subscriptions')
+def _send_push(recipient_email: str, subscriptions_info, data):
+    """Send the data to each of the subscriptions and delete the ones that are gone."""
+    from pywebpush import WebPushException  # pylint: disable=import-outside-toplevel
+
+    gone_endpoints = []
+    for subscription_info in subscriptions_info:
+        try:
+            with NOTIFICATION_LATENCY.labels('push').time():
+                webpush.send(subscription_info, data)
+        except WebPushException as ex:
+            if ex.response is not None and ex.response.status_code in GONE_STATUSES:
+                gone_endpoints.append(subscription_info['endpoint'])
+                continue
+            NOTIFICATION_FAILURES.labels('push').inc()
+            log.exception(ex)
+
+    if gone_endpoints:
+        log.info('Removing %d expired push subscription(s) of %s',
+                 len(gone_endpoints), recipient_email)
+        PushSubscription.query.filter(
+            PushSubscription.account_email == recipient_email,
+            PushSubscription.endpoint.in_(gone_endpoints),
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def push(recipient_email: str, notification_type: NotificationType, payload=None,
+         subscriptions=None):
+    '''Sends a notification to the specified user.
+    The subscriptions are looked up unless they are given.
+
+    The notification is sent by the background sender threads,
+    which also delete the subscriptions that the push service reports as gone.'''
     if subscriptions is None:
-        log.error(f'User {recipient_email} is not subscribed to push notifications.')
+        subscriptions = PushSubscription.query.filter_by(account_email=recipient_email).all()
+    if not subscriptions:
+        log.error('User %s is not subscribed to push notifications.', recipient_email)
         return
 
     try:
@@ -34,27 +69,40 @@ def push(recipient_email: str, notification_type: NotificationType, payload=None
     except KeyError:
         data = payload
 
-    for subscription in subscriptions:
-        try:
-            webpush.send(subscription, data)
-        except WebPushException as ex:
-            log.exception(ex)
+    submit(_send_push, recipient_email,
+           [subscription.subscription_info for subscription in subscriptions], data)
 
 
 def subscribe(user, subscription_information):
-    '''Add the subscription information to the list of the user's push subscriptions.'''
-    settings = user.notification_settings
-    settings.update({
-        'subscriptions': settings.get('subscriptions', []) + [subscription_information]
-    })
-    flag_modified(user, 'notification_settings')
+    '''Add the subscription to the user's push subscriptions.
+    A browser that was subscribed before, possibly by another user, is taken over.'''
+    keys = subscription_information['keys']
+    upsert = insert(PushSubscription.__table__).values(
+        endpoint=subscription_information['endpoint'],
+        account_email=user.email,
+        p256dh=keys['p256dh'],
+        auth=keys['auth'],
+    )
 
     try:
+        db.session.execute(upsert.on_conflict_do_update(
+            index_elements=['endpoint'],
+            set_={column: getattr(upsert.excluded, column)
+                  for column in ('account_email', 'p256dh', 'auth')},
+        ))
         db.session.commit()
-    except IntegrityError as exc:
+    except (IntegrityError, DataError) as exc:
         db.session.rollback()
         log.exception(exc)
         raise exc
 
 
-# TODO: create unsubscribe method to remove all (or some) push subscriptions
+def unsubscribe(user, endpoint=None):
+    '''Remove the subscription with the given endpoint from the user's push subscriptions,
+    or all of them if the endpoint isn't given. Returns the number of removed subscriptions.'''
+    query = PushSubscription.query.filter_by(account_email=user.email)
+    if endpoint is not None:
+        query = query.filter_by(endpoint=endpoint)
+    removed = query.delete(synchronize_session=False)
+    db.session.commit()
+    return removed
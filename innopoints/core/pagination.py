@@ -0,0 +1,97 @@
+"""Keyset pagination helpers.
+
+A cursor is an opaque token holding the sort key of the last row of a page.
+The next page starts right after that row, so it's found with an index lookup
+instead of skipping the rows of all the previous pages.
+
+Counting all the matching rows costs as much as reading them, so the total is only
+computed on request: exactly, estimated from the query plan, or not at all."""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from flask import request
+
+from innopoints.core.helpers import abort
+from innopoints.extensions import db
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+
+def encode_cursor(*values) -> str:
+    """Pack the sort key of a row into a cursor. Datetimes are kept with their timezone."""
+    prepared = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(prepared).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple:
+    """Unpack the cursor into the sort key of the given types, aborting with 400 if invalid."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return tuple(datetime.fromisoformat(value) if type_ is datetime else type_(value)
+                     for (value, type_) in zip(values, types))
+    except (binascii.Error, TypeError, ValueError):
+        abort(400, {'message': 'The cursor is invalid.'})
+
+
+def requested_cursor(types: Sequence[type]) -> Optional[Tuple]:
+    """Return the decoded `cursor` query parameter or None if it wasn't passed."""
+    if 'cursor' not in request.args:
+        return None
+    return decode_cursor(request.args['cursor'], types)
+
+
+def requested_limit(default: int = DEFAULT_LIMIT) -> int:
+    """Return the validated `limit` query parameter, lowered to MAX_LIMIT if above it.
+    The older clients could ask for any page size, so a larger limit is not an error."""
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        abort(400, {'message': 'The limit must be an integer.'})
+    if limit < 1:
+        abort(400, {'message': 'The limit must be positive.'})
+    return min(limit, MAX_LIMIT)
+
+
+def requested_count_mode(default: str = 'none') -> str:
+    """Return the validated `count` query parameter."""
+    mode = request.args.get('count', default)
+    if mode not in COUNT_MODES:
+        abort(400, {'message': f'The count must be one of: {", ".join(COUNT_MODES)}.'})
+    return mode
+
+
+def estimate_count(query) -> int:
+    """Return the number of rows the planner expects the query to produce."""
+    compiled = query.statement.compile(dialect=db.session.get_bind().dialect)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + compiled.string, compiled.params)
+        return int(cursor.fetchone()[0][0]['Plan']['Plan Rows'])
+    finally:
+        cursor.close()
+
+
+def count_rows(query, mode: str) -> Optional[int]:
+    """Count the rows of the query in the given mode, None if the count isn't requested."""
+    if mode == 'exact':
+        return query.order_by(None).count()
+    if mode == 'estimate':
+        return estimate_count(query.order_by(None))
+    return None
+
+
+def keyset_filter(columns: Sequence, cursor: Tuple, descending: bool = False):
+    """Build the condition selecting the rows that come after the cursor
+    when ordered by the given columns, all in the same direction."""
+    if descending:
+        return db.tuple_(*columns) < db.tuple_(*cursor)
+    return db.tuple_(*columns) > db.tuple_(*cursor)
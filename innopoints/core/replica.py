@@ -0,0 +1,68 @@
+"""Routing of the read-only requests to a replica of the database.
+
+The replica is configured as the 'replica' bind in SQLALCHEMY_BINDS. Only the views marked
+with `replica_safe` read from it, everything else goes to the primary. A request switches
+back to the primary as soon as it writes something. After a write, the client is pinned
+to the primary for REPLICA_LAG_WINDOW seconds so it sees its own changes even if the
+replica is behind."""
+
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session as flask_session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+from sqlalchemy.sql.dml import UpdateBase
+
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(SignallingSession):
+    """A session sending the reads of the replica-safe views to the replica."""
+    def get_bind(self, mapper=None, clause=None):
+        # pylint: disable=protected-access
+        if self._flushing or isinstance(clause, UpdateBase):
+            _mark_written()
+        elif _use_replica(self.app):
+            return self.app.extensions['sqlalchemy'].db.get_engine(self.app, bind=REPLICA_BIND)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy with the replica-aware session."""
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def _use_replica(app) -> bool:
+    """Decide whether the current read may be served by the replica."""
+    if not has_request_context() or not g.get('replica_safe') or g.get('db_written'):
+        return False
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return False
+    return flask_session.get('primary_until', 0) < time.time()
+
+
+def _mark_written(*_args):
+    if has_request_context():
+        g.db_written = True
+
+
+def _pin_to_primary(_session):
+    """Keep the client on the primary until the replica catches up with the write."""
+    if has_request_context() and g.get('db_written'):
+        flask_session['primary_until'] = time.time() + current_app.config['REPLICA_LAG_WINDOW']
+
+
+event.listen(RoutingSession, 'after_flush', _mark_written)
+event.listen(RoutingSession, 'after_commit', _pin_to_primary)
+
+
+def replica_safe(view):
+    """Allow the decorated read-only view to read from the replica."""
+    @wraps(view)
+    def routed_view(*args, **kwargs):
+        g.replica_safe = True
+        return view(*args, **kwargs)
+    return routed_view
@@ -0,0 +1,103 @@
+"""Recording of the SQL statements that take longer than SLOW_QUERY_THRESHOLD milliseconds.
+
+The recorder is disabled unless the threshold is configured. Every slow statement is kept
+with its parameters in a ring buffer of SLOW_QUERY_LOG_SIZE entries, which is separate for
+each worker process, so the log only shows the statements run by the worker that serves it.
+The whole history of all the workers is in the warnings of the application log.
+
+A SLOW_QUERY_EXPLAIN_RATE fraction of the slow statements is passed to a plain `EXPLAIN`
+to capture the estimated plan. The statement isn't executed again, so its side effects
+and locks don't happen twice and the request isn't slowed down by a second run.
+For the actual row counts and timings, use the auto_explain module of PostgreSQL."""
+
+import logging
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+log = logging.getLogger(__name__)
+EXPLAINABLE_STATEMENT = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+slow_queries = deque(maxlen=100)
+
+
+def _explain(conn, statement, parameters):
+    """Return the estimated JSON plan of the statement or None if it couldn't be obtained.
+    The plan is requested within a savepoint, so that an error doesn't abort the transaction."""
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute('SAVEPOINT explain_slow_query')
+        try:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+            return cursor.fetchone()[0]
+        except Exception as exc:  # pylint: disable=broad-except
+            log.warning('Could not explain the slow query: %s', exc)
+            return None
+        finally:
+            cursor.execute('ROLLBACK TO SAVEPOINT explain_slow_query')
+            cursor.execute('RELEASE SAVEPOINT explain_slow_query')
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, _cursor, _statement, _parameters, _context, _executemany):
+    conn.info.setdefault('slow_query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, _cursor, statement, parameters, _context, executemany):
+    """Record the statement if it was slow."""
+    elapsed = time.perf_counter() - conn.info['slow_query_start_time'].pop()
+    if not has_app_context():
+        return
+
+    threshold = current_app.config.get('SLOW_QUERY_THRESHOLD')
+    if threshold is None or elapsed * 1000 < threshold:
+        return
+
+    plan = None
+    if (not executemany and EXPLAINABLE_STATEMENT.match(statement)
+            and random.random() < current_app.config.get('SLOW_QUERY_EXPLAIN_RATE', 0)):
+        plan = _explain(conn, statement, parameters)
+
+    log.warning('Slow query (%.1fms): %s', elapsed * 1000, statement)
+    slow_queries.append({
+        'time': datetime.now(timezone.utc).isoformat(),
+        'duration_ms': round(elapsed * 1000, 1),
+        'endpoint': request.endpoint if has_request_context() else None,
+        'statement': statement,
+        'parameters': repr(parameters),
+        'plan': plan,
+    })
+
+
+def _handle_error(context):
+    """Forget the start time of the statement that failed, so it isn't left on the stack."""
+    if context.connection is not None and context.execution_context is not None:
+        start_times = context.connection.info.get('slow_query_start_time')
+        if start_times:
+            start_times.pop()
+
+
+def recorded_queries():
+    """Return the slow queries recorded by this process, newest first."""
+    return list(reversed(slow_queries))
+
+
+def init_app(app):
+    """Register the database event listeners if the recorder is enabled."""
+    global slow_queries  # pylint: disable=global-statement,invalid-name
+    if app.config.get('SLOW_QUERY_THRESHOLD') is None:
+        return
+
+    slow_queries = deque(slow_queries, maxlen=app.config.get('SLOW_QUERY_LOG_SIZE', 100))
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
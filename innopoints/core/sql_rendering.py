@@ -0,0 +1,209 @@
+"""Rendering of the hot read-only listings directly in PostgreSQL.
+
+Instead of hydrating ORM objects and walking them with Marshmallow, the database builds
+the JSON document for each row with `json_build_object` and Flask streams the documents.
+PostgreSQL pads the separators of the JSON it builds with spaces, so each document is
+re-encoded compactly by orjson, which keeps the order of the keys.
+The documents mirror the output of the schemas used by the listing views, including the
+post-dump transformations, so the two rendering paths produce the same bytes.
+
+The rendering engine is selected with the LISTING_RENDERER configuration option."""
+
+import json
+from itertools import chain
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from flask import current_app, stream_with_context
+import orjson
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array
+
+from innopoints.extensions import db
+from innopoints.models import (
+    Account,
+    Activity,
+    activity_competence,
+    Application,
+    ApplicationStatus,
+    Product,
+    ProductImage,
+    Project,
+    project_moderation,
+    project_tags,
+    StockChange,
+    StockChangeStatus,
+    Variety,
+)
+
+EMPTY_ARRAY = db.literal_column("'[]'::json")
+
+
+def sql_rendering_enabled() -> bool:
+    """Return whether the listings should be rendered by the database."""
+    return current_app.config.get('LISTING_RENDERER') == 'sql'
+
+
+def json_object(pairs: Iterable[Tuple[str, object]], exclude: Sequence[str] = ()):
+    """Build a JSON object from (key, SQL expression) pairs, respecting JSON_SORT_KEYS."""
+    pairs = [(key, value) for (key, value) in pairs if key not in exclude]
+    if current_app.config['JSON_SORT_KEYS']:
+        pairs.sort(key=lambda pair: pair[0])
+    return db.func.json_build_object(
+        *chain.from_iterable((db.literal_column(f"'{key}'"), value) for (key, value) in pairs)
+    )
+
+
+def json_datetime(value):
+    """Format the timestamp the same way as `datetime.isoformat()` in the schemas.
+
+    The offset is that of the session time zone, which psycopg2 also attaches to
+    the loaded datetimes, and the microseconds are only shown if there are any.
+    The JSON functions of PostgreSQL would trim the trailing zeros of the fraction."""
+    fraction = db.case([(db.func.to_char(value, 'US') == '000000', '')],
+                       else_=db.func.to_char(value, '.US', type_=db.Text))
+    return (db.func.to_char(value, 'YYYY-MM-DD"T"HH24:MI:SS', type_=db.Text)
+            + fraction
+            + db.func.to_char(value, 'TZH:TZM', type_=db.Text))
+
+
+def json_array(element, order_by, *criteria):
+    """Build a correlated subquery aggregating the element into a JSON array."""
+    return db.select([
+        db.func.coalesce(db.func.json_agg(aggregate_order_by(element, order_by)), EMPTY_ARRAY)
+    ]).where(db.and_(*criteria)).as_scalar()
+
+
+def _activity_json():
+    """Mirror the activity fields of the project listing, see `list_ongoing_projects`."""
+    accepted_applications = db.select([
+        db.func.count(Application.id)
+    ]).where(db.and_(Application.activity_id == Activity.id,
+                     Application.status == ApplicationStatus.approved)).as_scalar()
+    vacant_spots = db.case([(Activity.people_required.is_(None), -1)],
+                           else_=Activity.people_required - accepted_applications)
+    competences = json_array(activity_competence.c.competence_id,
+                             activity_competence.c.competence_id,
+                             activity_competence.c.activity_id == Activity.id)
+    # `timeframe` is appended last by the post_dump hook of the ActivitySchema
+    return json_object([
+        ('competences', competences),
+        ('vacant_spots', vacant_spots),
+        ('id', Activity.id),
+        ('name', Activity.name),
+        ('internal', Activity.internal),
+        ('draft', Activity.draft),
+        ('timeframe', json_object([('start', json_datetime(Activity.start_date)),
+                                   ('end', json_datetime(Activity.end_date))])),
+    ])
+
+
+def _account_json():
+    """Mirror the `only=('full_name', 'email')` nesting of the AccountSchema."""
+    return json_object([('full_name', Account.full_name), ('email', Account.email)])
+
+
+def _project_json(exclude: Sequence[str]):
+    """Mirror the ProjectSchema used by `list_ongoing_projects`."""
+    creator = db.select([_account_json()]).where(
+        Account.email == Project.creator_email
+    ).as_scalar()
+    moderators = json_array(_account_json(), Account.email,
+                            project_moderation.c.project_id == Project.id,
+                            project_moderation.c.account_email == Account.email)
+    activities = json_array(_activity_json(), Activity.id, Activity.project_id == Project.id)
+    start_date = db.select([db.func.min(Activity.start_date)]).where(
+        Activity.project_id == Project.id
+    ).as_scalar()
+    end_date = db.select([db.func.max(Activity.end_date)]).where(
+        Activity.project_id == Project.id
+    ).as_scalar()
+    tags = json_array(project_tags.c.tag_id, project_tags.c.tag_id,
+                      project_tags.c.project_id == Project.id)
+    return json_object([
+        ('name', Project.name),
+        ('creator', creator),
+        ('image_id', Project.image_id),
+        ('review_status', db.cast(Project.review_status, db.Text)),
+        ('activities', activities),
+        ('moderators', moderators),
+        ('start_date', json_datetime(start_date)),
+        ('end_date', json_datetime(end_date)),
+        ('tags', tags),
+        ('id', Project.id),
+        ('creation_time', json_datetime(Project.creation_time)),
+    ], exclude)
+
+
+def _variety_json():
+    """Mirror the variety fields of the product listing, see `list_products`."""
+    # pylint: disable=invalid-unary-operand-type
+    images = json_array(ProductImage.image_id, ProductImage.order,
+                        ProductImage.variety_id == Variety.id)
+    amount = db.select([
+        db.func.coalesce(db.func.sum(StockChange.amount), 0)
+    ]).where(db.and_(StockChange.variety_id == Variety.id,
+                     StockChange.status != StockChangeStatus.rejected)).as_scalar()
+    purchases = db.select([
+        -db.func.coalesce(db.func.sum(StockChange.amount), 0)
+    ]).where(db.and_(StockChange.variety_id == Variety.id,
+                     StockChange.status != StockChangeStatus.rejected,
+                     StockChange.amount < 0,
+                     StockChange.account_email == Account.email,
+                     ~Account.is_admin)).as_scalar()
+    return json_object([
+        ('images', images),
+        ('amount', amount),
+        ('purchases', purchases),
+        ('id', Variety.id),
+        ('size', Variety.size),
+        ('color', db.literal('#') + Variety.color),
+    ])
+
+
+def _product_json():
+    """Mirror the ProductSchema used by `list_products`."""
+    varieties = json_array(_variety_json(), Variety.id, Variety.product_id == Product.id)
+    return json_object([
+        ('varieties', varieties),
+        ('name', Product.name),
+        ('type', Product.type),
+        ('price', Product.price),
+        ('id', Product.id),
+        ('addition_time', json_datetime(Product.addition_time)),
+    ])
+
+
+def _stream_rows(document, model, ids: List[int], prefix='', suffix=''):
+    """Stream the JSON documents of the given rows as an array, preserving the order of IDs."""
+    def generate():
+        yield prefix + '['
+        if ids:
+            query = (
+                db.select([db.cast(document, db.Text)])
+                .where(model.id.in_(ids))
+                .order_by(db.func.array_position(array(ids), model.id))
+            )
+            rows = db.session.execute(query.execution_options(stream_results=True))
+            for idx, (row,) in enumerate(rows):
+                row = orjson.dumps(orjson.loads(row)).decode()
+                yield row if idx == 0 else ',' + row
+        yield ']' + suffix + '\n'
+
+    return current_app.response_class(stream_with_context(generate()),
+                                      mimetype=current_app.config['JSONIFY_MIMETYPE'])
+
+
+def render_projects(ids: List[int], exclude: Sequence[str]):
+    """Return a response with the JSON array of projects with the given IDs."""
+    return _stream_rows(_project_json(exclude), Project, ids)
+
+
+def render_products(ids: List[int], pages: Optional[int], next_cursor: Optional[str] = None):
+    """Return a response with the page of products with the given IDs."""
+    pages, next_cursor = json.dumps(pages), json.dumps(next_cursor)
+    if current_app.config['JSON_SORT_KEYS']:
+        return _stream_rows(_product_json(), Product, ids,
+                            prefix='{"data":',
+                            suffix=f',"next_cursor":{next_cursor},"pages":{pages}}}')
+    return _stream_rows(_product_json(), Product, ids,
+                        prefix=f'{{"pages":{pages},"data":',
+                        suffix=f',"next_cursor":{next_cursor}}}')
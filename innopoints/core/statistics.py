@@ -0,0 +1,298 @@
+"""Volunteering statistics of the accounts.
+
+The statistics are computed in a single query: the applications of the account within
+the date range are collected once, then aggregated into the hours and positions,
+the report ratings and the competence histogram. The statistics over the whole lifetime
+of an account are also kept in its AccountSummary row, which is recalculated whenever
+an application changes its status, a report is written or feedback is left.
+
+The student groups are kept in the StudentGroup table with their member counts,
+so listing them doesn't scan all the accounts. Likewise, the dates, the vacant spots,
+the competences and the text of the activities of a project are kept in its ProjectSummary
+row, so the listing of the projects filters on indexed columns instead of grouping
+the activities on every request."""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Integer, and_, case, cast, exists, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import JSONB, insert
+
+from innopoints.extensions import db
+from innopoints.models import (
+    Account,
+    AccountSummary,
+    Activity,
+    Application,
+    ApplicationStatus,
+    activity_competence,
+    Competence,
+    feedback_competence,
+    LifetimeStage,
+    Project,
+    ProjectSummary,
+    StudentGroup,
+    VolunteeringReport,
+)
+
+
+# The groups of students look like B19-SE-01 or M20-1, the rest are staff roles
+STUDENT_GROUP_PATTERN = '[BM][0-9]+(-[A-Z]+)?-[0-9]+'
+# An arbitrary key for the PostgreSQL advisory locks serializing the recounts of a group,
+# the second key of a lock is the hash of the group name
+STUDENT_GROUP_LOCK_ID = 0x1AA0_5607
+
+
+def statistics_query(email: str,
+                     start_date: Optional[datetime] = None,
+                     end_date: Optional[datetime] = None):
+    """Build the query aggregating the statistics of an account
+    over the applications made within the date range.
+
+    The competence histogram is returned as a JSON object, keyed by the competence ID."""
+    # pylint: disable=bad-continuation
+    applications = Application.__table__
+    activities = Activity.__table__
+    projects = Project.__table__
+
+    date_filters = [applications.c.applicant_email == email]
+    if start_date is not None:
+        date_filters.append(applications.c.application_time >= start_date)
+    if end_date is not None:
+        date_filters.append(applications.c.application_time <= end_date)
+
+    own_applications = (
+        select([applications.c.id,
+                applications.c.status,
+                applications.c.actual_hours,
+                activities.c.fixed_reward,
+                activities.c.internal,
+                projects.c.lifetime_stage])
+            .select_from(applications
+                .join(activities, activities.c.id == applications.c.activity_id)
+                .join(projects, projects.c.id == activities.c.project_id))
+            .where(and_(*date_filters))
+    ).cte('own_applications')
+    approved = own_applications.c.status == ApplicationStatus.approved
+
+    counted = and_(approved,
+                   ~own_applications.c.fixed_reward,
+                   ~own_applications.c.internal,
+                   own_applications.c.lifetime_stage == LifetimeStage.finished)
+    volunteering = (
+        select([db.func.coalesce(db.func.sum(own_applications.c.actual_hours).filter(counted), 0)
+                    .label('hours'),
+                db.func.count(own_applications.c.id).filter(counted).label('positions')])
+    ).cte('volunteering')
+
+    reports = VolunteeringReport.__table__
+    rating = (
+        select([db.func.coalesce(db.func.sum(reports.c.rating), 0).label('rating_sum'),
+                db.func.count(reports.c.rating).label('rating_count')])
+            .select_from(reports.join(own_applications,
+                                      own_applications.c.id == reports.c.application_id))
+            .where(approved)
+    ).cte('rating')
+
+    competence_counts = (
+        select([feedback_competence.c.competence_id,
+                db.func.count().label('amount')])
+            .select_from(feedback_competence.join(
+                own_applications,
+                own_applications.c.id == feedback_competence.c.feedback_id))
+            .group_by(feedback_competence.c.competence_id)
+    ).cte('competence_counts')
+    histogram = (
+        select([db.func.coalesce(db.func.jsonb_object_agg(competence_counts.c.competence_id,
+                                                          competence_counts.c.amount),
+                                 cast(literal('{}'), JSONB)).label('competences')])
+    ).cte('histogram')
+
+    return select([volunteering.c.hours,
+                   volunteering.c.positions,
+                   rating.c.rating_sum,
+                   rating.c.rating_count,
+                   histogram.c.competences])
+
+
+def _named_competences(histogram):
+    """Build the scalar subquery expanding the competence histogram
+    into a JSON array of objects with the amount, the ID and the name."""
+    # pylint: disable=bad-continuation
+    entries = db.func.jsonb_each_text(histogram).alias('histogram_entries')
+    competence_id = cast(literal_column('histogram_entries.key'), Integer)
+    return (
+        select([db.func.coalesce(
+                    db.func.json_agg(db.func.json_build_object(
+                        'amount', cast(literal_column('histogram_entries.value'), Integer),
+                        'id', Competence.id,
+                        'name', Competence.name,
+                    )),
+                    literal_column("'[]'::json"))])
+            .select_from(entries.join(Competence.__table__, Competence.id == competence_id))
+    ).as_scalar()
+
+
+def _as_dict(row) -> dict:
+    """Convert a row of the statistics into the response format."""
+    return {
+        'hours': row.hours,
+        'positions': row.positions,
+        'rating': row.rating_sum / row.rating_count if row.rating_count else 0.0,
+        'competences': row.competences,
+    }
+
+
+def account_statistics(email: str,
+                       start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None) -> dict:
+    """Return the statistics of an account over the applications made within the date range.
+
+    If the range is unbounded, the statistics are read from the account summary."""
+    if start_date is None and end_date is None:
+        summaries = AccountSummary.__table__
+        row = db.session.execute(
+            select([summaries.c.hours,
+                    summaries.c.positions,
+                    summaries.c.rating_sum,
+                    summaries.c.rating_count,
+                    _named_competences(summaries.c.competences).label('competences')])
+            .where(summaries.c.account_email == email)
+        ).first()
+        if row is not None:
+            return _as_dict(row)
+
+    statistics = statistics_query(email, start_date, end_date).alias('statistics')
+    row = db.session.execute(
+        select([statistics.c.hours,
+                statistics.c.positions,
+                statistics.c.rating_sum,
+                statistics.c.rating_count,
+                _named_competences(statistics.c.competences).label('competences')])
+    ).first()
+    return _as_dict(row)
+
+
+def refresh_account_summary(*emails: str):
+    """Recalculate the summaries of the given accounts within the current transaction."""
+    db.session.flush()
+    for email in set(emails):
+        statistics = statistics_query(email).alias('statistics')
+        upsert = insert(AccountSummary.__table__).from_select(
+            ['account_email', 'hours', 'positions', 'rating_sum', 'rating_count', 'competences'],
+            select([literal(email), *statistics.c]),
+        )
+        db.session.execute(upsert.on_conflict_do_update(
+            index_elements=['account_email'],
+            set_={column: getattr(upsert.excluded, column)
+                  for column in ('hours', 'positions', 'rating_sum', 'rating_count',
+                                 'competences')},
+        ))
+
+
+def refresh_student_groups(*names: Optional[str]):
+    """Recount the members of the given student groups within the current transaction.
+
+    The recounts of a group are serialized with a transaction-level advisory lock,
+    so that a concurrent change can't write a stale count or delete a group
+    that another transaction has just populated."""
+    names = {name for name in names if name is not None}
+    if not names:
+        return
+
+    db.session.flush()
+    for name in sorted(names):
+        db.session.execute(select([
+            db.func.pg_advisory_xact_lock(STUDENT_GROUP_LOCK_ID, db.func.hashtext(name))
+        ]))
+    is_member = and_(Account.group.in_(names),
+                     ~Account.is_admin,
+                     Account.group.op('SIMILAR TO')(STUDENT_GROUP_PATTERN))
+    upsert = insert(StudentGroup.__table__).from_select(
+        ['name', 'member_count'],
+        select([Account.group, db.func.count()]).where(is_member).group_by(Account.group),
+    )
+    db.session.execute(upsert.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'member_count': upsert.excluded.member_count},
+    ))
+    StudentGroup.query.filter(
+        StudentGroup.name.in_(names),
+        ~exists().where(and_(is_member, Account.group == StudentGroup.name)),
+    ).delete(synchronize_session=False)
+
+
+def refresh_project_summary(*project_ids: int):
+    """Recalculate the summaries of the given projects within the current transaction.
+
+    The internal activities are left out, as nobody can apply for them. A project without
+    other activities still gets a row, with no dates and no vacant spots.
+
+    The project rows are locked first, so that concurrent changes to the same project
+    are summarized one after another, each seeing the ones committed before it."""
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+
+    # pylint: disable=bad-continuation
+    db.session.flush()
+    activities = Activity.__table__
+    applications = Application.__table__
+    projects = Project.__table__
+    db.session.execute(
+        select([projects.c.id])
+            .where(projects.c.id.in_(project_ids))
+            .order_by(projects.c.id)
+            .with_for_update()
+    )
+    in_projects = and_(activities.c.project_id.in_(project_ids), ~activities.c.internal)
+
+    accepted = (
+        select([applications.c.activity_id, db.func.count().label('amount')])
+            .select_from(applications.join(activities,
+                                           activities.c.id == applications.c.activity_id))
+            .where(and_(in_projects, applications.c.status == ApplicationStatus.approved))
+            .group_by(applications.c.activity_id)
+    ).cte('accepted')
+    competences = (
+        select([activities.c.project_id,
+                db.func.array_agg(activity_competence.c.competence_id.distinct())
+                    .label('competences')])
+            .select_from(activity_competence.join(
+                activities, activities.c.id == activity_competence.c.activity_id))
+            .where(in_projects)
+            .group_by(activities.c.project_id)
+    ).cte('project_competences')
+
+    spots = activities.c.people_required - db.func.coalesce(accepted.c.amount, 0)
+    activity_text = db.func.concat_ws('\n', activities.c.name, activities.c.description)
+    summaries = (
+        select([projects.c.id,
+                db.func.min(activities.c.start_date),
+                db.func.max(activities.c.start_date),
+                db.func.min(activities.c.end_date),
+                case([(db.func.count(activities.c.id) == 0, 0),
+                      (db.func.bool_or(activities.c.people_required.is_(None)), None)],
+                     else_=db.func.max(spots)),
+                db.func.coalesce(competences.c.competences, cast(literal([]), db.ARRAY(Integer))),
+                db.func.concat_ws('\n', projects.c.name,
+                                  db.func.string_agg(activity_text, '\n'))])
+            .select_from(projects
+                .outerjoin(activities, and_(activities.c.project_id == projects.c.id,
+                                            ~activities.c.internal))
+                .outerjoin(accepted, accepted.c.activity_id == activities.c.id)
+                .outerjoin(competences, competences.c.project_id == projects.c.id))
+            .where(projects.c.id.in_(project_ids))
+            .group_by(projects.c.id, competences.c.competences)
+    )
+    upsert = insert(ProjectSummary.__table__).from_select(
+        ['project_id', 'first_start', 'last_start', 'first_end', 'vacant_spots', 'competences',
+         'search_text'],
+        summaries,
+    )
+    db.session.execute(upsert.on_conflict_do_update(
+        index_elements=['project_id'],
+        set_={column: getattr(upsert.excluded, column)
+              for column in ('first_start', 'last_start', 'first_end', 'vacant_spots',
+                             'competences', 'search_text')},
+    ))
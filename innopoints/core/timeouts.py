@@ -0,0 +1,72 @@
+"""Statement timeouts set for each database transaction.
+
+A timeout set with `SET LOCAL` only lasts until the end of the transaction, so it does
+not leak to other clients when the connection is shared through PgBouncer. The timeout
+comes from the `statement_timeout` decorator of the view or, in the PgBouncer mode,
+from the DB_STATEMENT_TIMEOUT setting (otherwise it is set once per connection).
+
+The timeout of the view is looked up before the request runs any query, so it is set
+on each connection as its transaction begins, be it on the primary or the replica."""
+
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from psycopg2.errors import QueryCanceled
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from innopoints.core.helpers import abort
+from innopoints.extensions import db
+
+
+def _current_timeout():
+    """Return the statement timeout in milliseconds for the current transaction, if any."""
+    if has_request_context() and 'statement_timeout' in g:
+        return g.statement_timeout
+    if has_app_context() and current_app.config.get('DB_PGBOUNCER'):
+        return current_app.config.get('DB_STATEMENT_TIMEOUT') or None
+    return None
+
+
+def _after_begin(_session, _transaction, connection):
+    """Apply the statement timeout to the transaction that has just begun."""
+    timeout = _current_timeout()
+    if timeout is not None:
+        connection.execute(db.text(f'SET LOCAL statement_timeout = {int(timeout)}'))
+
+
+def _use_view_timeout():
+    """Remember the statement timeout of the view that is about to handle the request."""
+    view = current_app.view_functions.get(request.endpoint)
+    timeout = getattr(view, 'statement_timeout', None)
+    if timeout is not None:
+        g.statement_timeout = timeout
+
+
+def statement_timeout(milliseconds: int):
+    """Cancel the statements of the decorated view that run longer than the given time.
+    The canceled request is answered with 503.
+
+    The timeout is kept as an attribute of the view, which `functools.wraps`
+    copies to the decorators applied on top of it."""
+    def decorator(view):
+        @wraps(view)
+        def limited_view(*args, **kwargs):
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as exc:
+                if not isinstance(exc.orig, QueryCanceled):
+                    raise
+                db.session.rollback()
+                abort(503, {'message': 'The request took too long to process.'})
+        limited_view.statement_timeout = milliseconds
+        return limited_view
+    return decorator
+
+
+def init_app(app):
+    """Register the transaction event listener and the lookup of the view's timeout."""
+    if not event.contains(Session, 'after_begin', _after_begin):
+        event.listen(Session, 'after_begin', _after_begin)
+    app.before_request(_use_view_timeout)
@@ -4,30 +4,60 @@ To avoid circular imports with views and create_app(), extensions are instantiat
 They will be initialized (calling init_app()) in app.py.
 """
 
-import os
+import threading
+from functools import partial
+from importlib import import_module
 
-from authlib.integrations.flask_client import OAuth
 from flask_login import LoginManager
 from flask_mail import Mail
 from flask_marshmallow import Marshmallow
-from flask_sqlalchemy import SQLAlchemy
-from flask_pywebpush import WebPush
 
+from innopoints.core.replica import RoutingSQLAlchemy
 
-db = SQLAlchemy()
+
+class LazyExtension:
+    """A stand-in for an extension whose dependencies are expensive to import.
+
+    The calls to the `deferred` methods are recorded until the extension class is imported
+    and instantiated by `load()`, which replays them. `create_app` loads the extensions
+    once it has configured them, so the app isn't changed later while serving a request."""
+    def __init__(self, import_path: str, deferred=('init_app',)):
+        self._import_path = import_path
+        self._deferred = deferred
+        self._calls = []
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def _record(self, name, *args, **kwargs):
+        self._calls.append((name, args, kwargs))
+
+    def load(self):
+        """Import and instantiate the extension, replaying the recorded calls."""
+        with self._lock:
+            if self._instance is None:
+                module_name, class_name = self._import_path.split(':')
+                instance = getattr(import_module(module_name), class_name)()
+                for name, args, kwargs in self._calls:
+                    getattr(instance, name)(*args, **kwargs)
+                self._instance = instance
+        return self._instance
+
+    def __getattr__(self, name):
+        if self._instance is None and name in self._deferred:
+            return partial(self._record, name)
+        return getattr(self._instance or self.load(), name)
+
+
+db = RoutingSQLAlchemy()
 
 ma = Marshmallow()
 
-oauth = OAuth()
-oauth.register(
-    'innopolis_sso',
-    server_metadata_url=f'{os.getenv("INNOPOLIS_SSO_BASE")}/.well-known/openid-configuration',
-    client_kwargs={'scope': 'openid'},
-)
+oauth = LazyExtension('authlib.integrations.flask_client:OAuth',
+                      deferred=('init_app', 'register'))
 
 login_manager = LoginManager()
 login_manager.session_protection = 'basic'
 
 mail = Mail()
 
-push = WebPush()
+push = LazyExtension('flask_pywebpush:WebPush')
@@ -7,4 +7,5 @@ from .file import *
 from .notification import *
 from .product import *
 from .project import *
+from .timeline import *
 from .variety import *
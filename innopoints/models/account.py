@@ -1,10 +1,18 @@
-"""The Account and Transaction models.
+"""The Account, AccountSummary, StudentGroup, LegacyAccount, Transaction
+and BalanceCheckpoint models.
 
 Also contains the function to load the user for the login manager."""
 
+import copy
+import time
+
+from flask import current_app
 from flask_login.mixins import UserMixin
+from sqlalchemy import event
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
 
+from innopoints.core.timezone import tz_aware_now
 from innopoints.extensions import db, login_manager
 from innopoints.models.notification import NotificationGroup
 
@@ -22,7 +30,7 @@ class Account(UserMixin, db.Model):
     __tablename__ = 'accounts'
 
     full_name = db.Column(db.String(256), nullable=False)
-    group = db.Column(db.String(64), nullable=True)
+    group = db.Column(db.String(64), nullable=True, index=True)
     email = db.Column(db.String(128), primary_key=True)
     telegram_username = db.Column(db.String(32), nullable=True)
     is_admin = db.Column(db.Boolean, nullable=False)
@@ -64,10 +72,105 @@ class Account(UserMixin, db.Model):
         ).scalar() or 0
 
 
+# Serve the substring and prefix searches of the accounts, which can't use a B-tree index
+db.Index('accounts_email_trgm', Account.email,
+         postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+db.Index('accounts_full_name_trgm', Account.full_name,
+         postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'})
+
+# The column values of the recently loaded users, keyed by e-mail.
+# Each worker process has its own cache, so a change made by another process
+# (including a demotion of an admin) is only noticed when the entry expires
+# after USER_CACHE_TTL seconds, which is why the TTL is kept short.
+IDENTITY_COLUMNS = ('email', 'full_name', 'group', 'telegram_username', 'is_admin',
+                    'notification_settings')
+_identity_cache = {}
+
+
 @login_manager.user_loader
 def load_user(email):
-    """Return a user instance by the e-mail."""
-    return Account.query.get(email)
+    """Return a user instance by the e-mail, without querying the database
+    if the user has been loaded recently."""
+    ttl = current_app.config.get('USER_CACHE_TTL', 0)
+    cached = _identity_cache.get(email)
+    if cached is not None and cached[0] > time.monotonic():
+        account = Account(**copy.deepcopy(cached[1]))
+        make_transient_to_detached(account)
+        return db.session.merge(account, load=False)
+
+    account = Account.query.get(email)
+    if account is not None and ttl > 0:
+        _identity_cache[email] = (
+            time.monotonic() + ttl,
+            copy.deepcopy({column: getattr(account, column) for column in IDENTITY_COLUMNS}),
+        )
+    return account
+
+
+@event.listens_for(Account, 'after_update')
+@event.listens_for(Account, 'after_delete')
+def forget_user(_mapper, _connection, account):
+    """Drop the changed account from the identity cache, and once again after the commit,
+    in case a concurrent request has cached the old row in the meantime."""
+    _identity_cache.pop(account.email, None)
+    session = object_session(account)
+    if session is not None:
+        session.info.setdefault('changed_accounts', set()).add(account.email)
+
+
+@event.listens_for(Session, 'after_commit')
+def forget_committed_users(session):
+    """Drop the accounts changed in the committed transaction from the identity cache."""
+    for email in session.info.pop('changed_accounts', ()):
+        _identity_cache.pop(email, None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def keep_rolled_back_users(session):
+    """Forget the accounts changed in the rolled back transaction, as they stay the same."""
+    session.info.pop('changed_accounts', None)
+
+
+class AccountSummary(db.Model):
+    """Represents the lifetime statistics of an account.
+
+    The row is recalculated whenever the underlying data changes,
+    see `innopoints.core.statistics.refresh_account_summary`."""
+    __tablename__ = 'account_summaries'
+
+    account_email = db.Column(db.String(128),
+                              db.ForeignKey('accounts.email', ondelete='CASCADE'),
+                              primary_key=True)
+    hours = db.Column(db.Integer, nullable=False, default=0)
+    positions = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    # The amount of feedback mentioning each competence, keyed by the competence ID
+    competences = db.Column(JSONB, nullable=False, default=dict)
+
+
+class StudentGroup(db.Model):
+    """Represents a group of students, as named in `Account.group`.
+
+    The rows are recalculated when the group of an account changes,
+    see `innopoints.core.statistics.refresh_student_groups`."""
+    __tablename__ = 'student_groups'
+
+    name = db.Column(db.String(64), primary_key=True)
+    member_count = db.Column(db.Integer, nullable=False)
+
+
+class LegacyAccount(db.Model):
+    """Represents an account of the old innopoints system whose points haven't been reclaimed.
+
+    The table is filled with `flask import-legacy`."""
+    __tablename__ = 'legacy_accounts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(128), nullable=True, index=True)
+    username = db.Column(db.String(128), nullable=True, index=True)
+    password = db.Column(db.String(256), nullable=False)
+    points = db.Column(db.Integer, nullable=False)
 
 
 class Transaction(db.Model):
@@ -84,9 +187,41 @@ class Transaction(db.Model):
                               nullable=False)
     # property `account` created with a backref
     change = db.Column(db.Integer, nullable=False)
+    time = db.Column(db.DateTime(timezone=True), nullable=False, default=tz_aware_now)
     stock_change_id = db.Column(db.Integer,
                                 db.ForeignKey('stock_changes.id', ondelete='SET NULL'),
                                 nullable=True)
     feedback_id = db.Column(db.Integer,
                             db.ForeignKey('feedback.application_id', ondelete='SET NULL'),
                             nullable=True)
+
+
+# Serves the balance lookups at a point in time
+db.Index('transactions_account_time', Transaction.account_email, Transaction.time)
+
+
+class BalanceCheckpoint(db.Model):
+    """Represents the balance of an account at a certain moment.
+
+    The checkpoints are made with `flask checkpoint-balances`, so that the balance
+    at a point in time only needs the transactions since the previous checkpoint."""
+    __tablename__ = 'balance_checkpoints'
+
+    account_email = db.Column(db.String(128),
+                              db.ForeignKey('accounts.email', ondelete='CASCADE'),
+                              primary_key=True)
+    time = db.Column(db.DateTime(timezone=True), primary_key=True)
+    balance = db.Column(db.Integer, nullable=False)
+
+
+@event.listens_for(Transaction, 'before_delete')
+def forget_checkpoints(_mapper, connection, transaction):
+    """Drop the checkpoints that have counted the deleted transaction.
+
+    The balances after it are then summed up from the earlier checkpoints again,
+    instead of carrying the removed change into every later checkpoint."""
+    checkpoints = BalanceCheckpoint.__table__
+    connection.execute(
+        checkpoints.delete().where(db.and_(checkpoints.c.account_email == transaction.account_email,
+                                           checkpoints.c.time >= transaction.time))
+    )
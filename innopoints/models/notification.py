@@ -1,4 +1,4 @@
-"""The Notification model."""
+"""The Notification and PushSubscription models."""
 
 from enum import Enum, auto
 
@@ -59,3 +59,24 @@ class Notification(db.Model):
     payload = db.Column(JSONB, nullable=True)
     timestamp = db.Column(db.DateTime(timezone=True), nullable=False, default=tz_aware_now)
     type = db.Column(db.Enum(NotificationType), nullable=False)
+
+
+class PushSubscription(db.Model):
+    """Represents a browser subscribed to the push notifications of an account."""
+    __tablename__ = 'push_subscriptions'
+
+    endpoint = db.Column(db.Text, primary_key=True)
+    account_email = db.Column(db.String(128),
+                              db.ForeignKey('accounts.email', ondelete='CASCADE'),
+                              nullable=False,
+                              index=True)
+    p256dh = db.Column(db.String(128), nullable=False)
+    auth = db.Column(db.String(64), nullable=False)
+
+    @property
+    def subscription_info(self):
+        """Return the subscription in the format of the Push API."""
+        return {
+            'endpoint': self.endpoint,
+            'keys': {'p256dh': self.p256dh, 'auth': self.auth},
+        }
@@ -30,3 +30,8 @@ class Product(db.Model):
         if self.type is None:
             return self.name
         return f"'{self.name}' {self.type}"
+
+
+# Serve the keyset pagination of the products in each of the orders
+db.Index('products_addition_time_keyset', Product.addition_time, Product.id)
+db.Index('products_price_keyset', Product.price, Product.id)
@@ -1,4 +1,4 @@
-"""The Project, ProjectFile and Tag models."""
+"""The Project, ProjectSummary, ProjectFile and Tag models."""
 
 from enum import Enum, auto
 
@@ -99,6 +99,39 @@ class Project(db.Model):
         return f'/file/{self.image_id}'
 
 
+# Serves the keyset pagination of the past projects, newest first
+db.Index('projects_past_keyset', Project.creation_time, Project.id,
+         postgresql_where=Project.lifetime_stage.in_((LifetimeStage.finalizing,
+                                                      LifetimeStage.finished)))
+
+
+class ProjectSummary(db.Model):
+    """Represents the dates, the vacant spots, the competences and the searchable text
+    of the activities of a project, which the listing of the projects is filtered by.
+
+    The row is recalculated whenever the activities or their applications change,
+    see `innopoints.core.statistics.refresh_project_summary`."""
+    __tablename__ = 'project_summaries'
+
+    project_id = db.Column(db.Integer,
+                           db.ForeignKey('projects.id', ondelete='CASCADE'),
+                           primary_key=True)
+    first_start = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
+    last_start = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
+    first_end = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
+    # The most vacant spots in a single activity, NULL if some activity takes any amount of people
+    # and 0 if there are no activities open for applications
+    vacant_spots = db.Column(db.Integer, nullable=True, index=True)
+    competences = db.Column(db.ARRAY(db.Integer), nullable=False, default=list)
+    # The name of the project and the names and descriptions of its activities
+    search_text = db.Column(db.Text, nullable=False, default='')
+
+
+# Serves the substring search of the projects, which can't use a B-tree index
+db.Index('project_summaries_search_text_trgm', ProjectSummary.search_text,
+         postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'})
+
+
 class ProjectFile(db.Model):
     """Represents the files that can only be accessed by volunteers and moderators
        of a certain project."""
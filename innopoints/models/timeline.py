@@ -0,0 +1,66 @@
+"""The TimelineEvent model."""
+
+from enum import Enum, auto
+
+from sqlalchemy import event
+
+from innopoints.core.timezone import tz_aware_now
+from innopoints.extensions import db
+
+
+class TimelineEventType(Enum):
+    """Represents the kinds of entries in the account timeline."""
+    application = auto()
+    purchase = auto()
+    promotion = auto()
+    project = auto()
+
+
+class TimelineEvent(db.Model):
+    """Represents an entry in the timeline of an account.
+
+    The event only references the entity it is about,
+    the rest of the displayed data is read from the entity itself."""
+    __tablename__ = 'timeline_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_email = db.Column(db.String(128),
+                              db.ForeignKey('accounts.email', ondelete='CASCADE'),
+                              nullable=False)
+    entry_time = db.Column(db.DateTime(timezone=True), nullable=False)
+    type = db.Column(db.Enum(TimelineEventType), nullable=False)
+    application_id = db.Column(db.Integer,
+                               db.ForeignKey('applications.id', ondelete='CASCADE'),
+                               nullable=True)
+    stock_change_id = db.Column(db.Integer,
+                                db.ForeignKey('stock_changes.id', ondelete='CASCADE'),
+                                nullable=True)
+    project_id = db.Column(db.Integer,
+                           db.ForeignKey('projects.id', ondelete='CASCADE'),
+                           nullable=True)
+    account = db.relationship('Account')
+    application = db.relationship('Application')
+    stock_change = db.relationship('StockChange')
+    project = db.relationship('Project')
+
+
+# Serves the keyset pagination of the timeline, newest first
+db.Index('timeline_events_keyset', TimelineEvent.account_email,
+         TimelineEvent.entry_time.desc(), TimelineEvent.id.desc())
+
+
+@event.listens_for(TimelineEvent, 'before_insert')
+def default_entry_time(_mapper, _connection, timeline_event):
+    """Take the time of the event from the entity it is about,
+    which has already been inserted by then."""
+    if timeline_event.entry_time is not None:
+        return
+
+    if timeline_event.type == TimelineEventType.application:
+        timeline_event.entry_time = timeline_event.application.application_time
+    elif timeline_event.type == TimelineEventType.purchase:
+        timeline_event.entry_time = timeline_event.stock_change.time
+    elif timeline_event.type == TimelineEventType.project:
+        timeline_event.entry_time = timeline_event.project.creation_time
+    else:
+        timeline_event.entry_time = tz_aware_now()
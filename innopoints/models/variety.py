@@ -121,6 +121,11 @@ class StockChange(db.Model):
     transaction = db.relationship('Transaction', uselist=False)
 
 
+# Serves the keyset pagination of the purchases, newest first
+db.Index('stock_changes_purchases_keyset', StockChange.time, StockChange.id,
+         postgresql_where=StockChange.amount < 0)
+
+
 class Color(db.Model):
     """Represents colors of items in the store."""
     __tablename__ = 'colors'
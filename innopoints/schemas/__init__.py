@@ -8,3 +8,4 @@ from .product import *
 from .project import *
 from .variety import *
 from .notification import *
+from .registry import *
@@ -5,6 +5,7 @@ from marshmallow import validate, validates_schema, ValidationError, pre_load, p
 from innopoints.extensions import ma
 from innopoints.models import Activity, Application, ApplicationStatus, Competence
 from .application import ApplicationSchema
+from .registry import get_schema
 
 
 # pylint: disable=missing-docstring
@@ -43,12 +44,12 @@ class ActivitySchema(ma.SQLAlchemyAutoSchema):
     @post_dump
     def wrap_dates(self, data, **_kwargs):
         """Collapse the two date properties into the {"start": , "end": } dates object."""
-        if 'start_date' not in data:
+        if 'start_date' not in data and 'end_date' not in data:
             return data
 
         data['timeframe'] = {
-            'start': data.pop('start_date'),
-            'end': data.pop('end_date')
+            'start': data.pop('start_date', None),
+            'end': data.pop('end_date', None)
         }
         return data
 
@@ -83,15 +84,15 @@ class ActivitySchema(ma.SQLAlchemyAutoSchema):
             fields.append('feedback')
             fields.append('reports')
 
-        appl_schema = ApplicationSchema(only=fields, many=True)
+        appl_schema = get_schema(ApplicationSchema, only=fields, many=True)
         applications = Application.query.filter_by(**filtering)
         return appl_schema.dump(applications.all())
 
     def get_existing_application(self, activity):
         """Using the user information from the context, provide a shorthand
         for the existing application of a volunteer."""
-        appl_schema = ApplicationSchema(only=('id', 'telegram_username', 'comment',
-                                              'actual_hours', 'status', 'feedback'))
+        appl_schema = get_schema(ApplicationSchema, only=('id', 'telegram_username', 'comment',
+                                                          'actual_hours', 'status', 'feedback'))
         if 'user' in self.context and self.context['user'].is_authenticated:
             application = Application.query.filter_by(applicant_email=self.context['user'].email,
                                                       activity_id=activity.id).one_or_none()
@@ -0,0 +1,88 @@
+"""A process-wide cache of schema instances used for serialization.
+
+Building a schema resolves its fields and nested schemas, which is wasteful to repeat
+on every request. `get_schema` builds each combination of options once and returns
+the same instance afterwards.
+
+Cached schemas are shared between threads, so their context must not be set with the
+`context` argument. Pass it for the duration of the dump with `schema_context` instead.
+Cached schemas must only be used for dumping: loading stores state on the instance."""
+
+import threading
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from functools import lru_cache
+
+from innopoints.core.instrumentation import timed
+
+
+class ThreadLocalContext(MutableMapping):
+    """A schema context that holds separate data for each thread."""
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def data(self) -> dict:
+        """Return the context data of the current thread."""
+        try:
+            return self._local.data
+        except AttributeError:
+            self._local.data = {}
+            return self._local.data
+
+    @data.setter
+    def data(self, value: dict):
+        self._local.data = value
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        # Nested schemas inherit the context with `context or {}`,
+        # so it has to be truthy to be shared even when empty.
+        return True
+
+
+dump_context = ThreadLocalContext()
+
+
+@contextmanager
+def schema_context(**context):
+    """Make the given context available to the cached schemas within the block."""
+    previous = dump_context.data
+    dump_context.data = context
+    try:
+        yield
+    finally:
+        dump_context.data = previous
+
+
+@lru_cache(maxsize=512)
+def _build_schema(schema_class, only, exclude, many):
+    """Instantiate the schema. Arguments must be hashable for the cache to work."""
+    schema = schema_class(only=only, exclude=exclude or (), many=many, context=dump_context)
+    schema.dump = timed('dump')(schema.dump)
+    return schema
+
+
+def get_schema(schema_class, only=None, exclude=(), many=False):
+    """Return a cached instance of the schema class with the given options."""
+    return _build_schema(schema_class,
+                         None if only is None else tuple(sorted(set(only))),
+                         tuple(sorted(set(exclude))),
+                         many)
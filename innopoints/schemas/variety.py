@@ -83,7 +83,7 @@ class VarietySchema(ma.SQLAlchemyAutoSchema):
     @post_dump
     def format_color(self, data, **_kwargs):
         """Add a '#' to the color value."""
-        if data['color'] is not None:
+        if data.get('color') is not None:
             data['color'] = '#' + data['color']
         return data
 
@@ -11,3 +11,7 @@ from .variety import *
 from .notification import *
 from .random import *
 from .statistics import *
+from .health import *
+from .metrics import *
+from .slow_queries import *
+from .export import *
@@ -4,8 +4,12 @@ Account:
 - GET    /account
 - GET    /accounts/{email}
 - GET    /accounts
+- GET    /accounts/autocomplete
 - GET    /accounts/groups
+- GET    /account/balance
+- GET    /accounts/{email}/balance
 - PATCH  /accounts/{email}/balance
+- POST   /accounts/balance
 - GET    /account/timeline
 - GET    /accounts/{email}/timeline
 - GET    /account/statistics
@@ -23,58 +27,71 @@ Innopoints:
 """
 
 from datetime import datetime
+from itertools import chain
+import csv
+import io
 import logging
-import sqlite3
 import math
 
 from flask import request, jsonify, session
 from flask_login import login_required, current_user
 from marshmallow import ValidationError
 from sqlalchemy import or_
-from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm.attributes import flag_modified
 from sqlalchemy.exc import IntegrityError
 from werkzeug.security import check_password_hash
 
 from innopoints.blueprints import api
-from innopoints.core.helpers import abort, admin_required
+from innopoints.core.helpers import abort, admin_required, allow_no_json, escape_like, LIKE_ESCAPE
+from innopoints.core.pagination import (
+    count_rows,
+    encode_cursor,
+    requested_count_mode,
+    requested_cursor,
+    requested_limit,
+)
 from innopoints.core.timezone import tz_aware_now, unix_epoch
-from innopoints.core.sql_hacks import as_row
-from innopoints.core.notifications import notify
+from innopoints.core.ledger import balance_as_of
+from innopoints.core.notifications import notify, notify_each
+from innopoints.core.replica import replica_safe
+from innopoints.core.statistics import account_statistics
 from innopoints.extensions import db
 from innopoints.models import (
     Account,
     Activity,
     Application,
-    ApplicationStatus,
-    Competence,
     Feedback,
-    feedback_competence,
-    LifetimeStage,
-    Notification,
+    LegacyAccount,
     NotificationType,
     Product,
     Project,
     StockChange,
+    StudentGroup,
+    TimelineEvent,
+    TimelineEventType,
     Transaction,
     Variety,
-    VolunteeringReport,
 )
-from innopoints.schemas import AccountSchema, TimelineSchema, NotificationSettingsSchema
+from innopoints.schemas import (
+    AccountSchema,
+    get_schema,
+    NotificationSettingsSchema,
+    schema_context,
+    TimelineSchema,
+)
 
 NO_PAYLOAD = ('', 204)
 log = logging.getLogger(__name__)
+# The bulk balance changes are inserted in one statement, which must fit the parameter limit
+MAX_BULK_CHANGES = 5000
 
 
-def subquery_to_events(subquery, event_type):
-    """Take a subquery that has an 'entry_time' field and output a query
-    that packs the rest of the fields into a JSON payload and returns it with the time."""
-    payload = db.func.row_to_json(as_row(subquery)).cast(JSONB) - 'entry_time'
-    return db.session.query(
-        'entry_time',
-        db.literal(event_type).label('type'),
-        payload.label('payload')
-    ).select_from(subquery)
+def jsonb_object(**fields):
+    """Build a JSONB object from the SQL expressions passed as keyword arguments."""
+    return db.func.jsonb_build_object(
+        *chain.from_iterable((db.literal_column(f"'{key}'"), value)
+                             for (key, value) in fields.items())
+    )
 
 
 @api.route('/account', defaults={'email': None})
@@ -94,61 +111,125 @@ def get_info(email):
             abort(403)
         user = Account.query.get_or_404(email)
 
-    out_schema = AccountSchema(exclude=('moderated_projects', 'created_projects', 'stock_changes',
-                                        'transactions', 'applications', 'reports',
-                                        'notification_settings', 'static_files'),
-                               context={'csrf_token': csrf_token})
-    return out_schema.jsonify(user)
+    out_schema = get_schema(AccountSchema, exclude=('moderated_projects', 'created_projects',
+                                                    'stock_changes', 'transactions',
+                                                    'applications', 'reports',
+                                                    'notification_settings', 'static_files'))
+    with schema_context(csrf_token=csrf_token):
+        return out_schema.jsonify(user)
 
 
 @api.route('/accounts/groups')
 @admin_required
 def list_groups():
     """Return a list of all existing groups of users."""
-    groups = db.session.query(Account.group) \
-                .filter(~Account.is_admin,
-                        Account.group.isnot(None),
-                        Account.group.op('SIMILAR TO')('[BM][0-9]+(-[A-Z]+)?-[0-9]+')) \
-                .group_by(Account.group) \
-                .order_by(Account.group)
+    groups = db.session.query(StudentGroup.name).order_by(StudentGroup.name)
     return jsonify([row[0] for row in groups.all()])
 
 
 @api.route('/accounts')
 @login_required
 def list_users():
-    """List all user accounts on the website."""
+    """List all user accounts on the website.
+
+    The pages are requested either by number or, more efficiently, by the cursor
+    from the previous page. The total is counted exactly for the numbered pages
+    and not at all for the cursor-based ones, unless overridden with `count`."""
     default_page = 1
     default_limit = 25
 
+    limit = requested_limit(default_limit)
+    cursor = requested_cursor((str,))
     try:
-        limit = int(request.args.get('limit', default_limit))
         page = int(request.args.get('page', default_page))
     except ValueError:
         abort(400, {'message': 'Bad query parameters.'})
+    if page < 1:
+        abort(400, {'message': 'Limit and page number must be positive.'})
+    count_mode = requested_count_mode('none' if cursor is not None else 'exact')
 
     db_query = db.session.query(Account.email, Account.full_name)
-    count_query = db.session.query(db.func.count(Account.email))
     if 'q' in request.args:
-        like_query = f'%{request.args["q"]}%'
+        like_query = f'%{escape_like(request.args["q"])}%'
         db_query = db_query.filter(
-            or_(Account.email.ilike(like_query),
-                Account.full_name.ilike(like_query))
-        )
-        count_query = count_query.filter(
-            or_(Account.email.ilike(like_query),
-                Account.full_name.ilike(like_query))
+            or_(Account.email.ilike(like_query, escape=LIKE_ESCAPE),
+                Account.full_name.ilike(like_query, escape=LIKE_ESCAPE))
         )
-
-    if limit < 1 or page < 1:
-        abort(400, {'message': 'Limit and page number must be positive.'})
+    total = count_rows(db_query, count_mode)
 
     db_query = db_query.order_by(Account.email.asc())
-    db_query = db_query.offset(limit * (page - 1)).limit(limit)
+    if cursor is not None:
+        db_query = db_query.filter(Account.email > cursor[0])
+    else:
+        db_query = db_query.offset(limit * (page - 1))
 
-    schema = AccountSchema(many=True, only=('email', 'full_name'))
-    return jsonify(pages=math.ceil(count_query.scalar() / limit),
-                   data=schema.dump(db_query.all()))
+    accounts = db_query.limit(limit + 1).all()
+    next_cursor = None
+    if len(accounts) > limit:
+        accounts = accounts[:limit]
+        next_cursor = encode_cursor(accounts[-1].email)
+
+    schema = get_schema(AccountSchema, many=True, only=('email', 'full_name'))
+    return jsonify(pages=None if total is None else math.ceil(total / limit),
+                   data=schema.dump(accounts),
+                   next_cursor=next_cursor)
+
+
+@api.route('/accounts/autocomplete')
+@login_required
+def autocomplete_users():
+    """Suggest the accounts whose e-mail or a word of the full name start with the query,
+    the most similar ones first."""
+    default_limit = 10
+
+    query = request.args.get('q', '').strip()
+    limit = requested_limit(default_limit)
+    if not query:
+        return jsonify([])
+
+    prefix = f'{escape_like(query)}%'
+    similarity = db.func.greatest(db.func.similarity(Account.email, query),
+                                  db.func.similarity(Account.full_name, query))
+    suggestions = (
+        # pylint: disable=bad-continuation
+        db.session.query(Account.email, Account.full_name)
+            .filter(or_(Account.email.ilike(prefix, escape=LIKE_ESCAPE),
+                        Account.full_name.ilike(prefix, escape=LIKE_ESCAPE),
+                        Account.full_name.ilike(f'% {prefix}', escape=LIKE_ESCAPE)))
+            .order_by(similarity.desc(), Account.email)
+            .limit(limit)
+    )
+
+    schema = get_schema(AccountSchema, many=True, only=('email', 'full_name'))
+    return jsonify(schema.dump(suggestions.all()))
+
+
+@api.route('/account/balance', defaults={'email': None})
+@api.route('/accounts/<string:email>/balance')
+@login_required
+@replica_safe
+def get_balance(email):
+    """Get the balance of the account, currently or at the moment passed as `at`.
+    If the e-mail is not passed, return own balance."""
+    if email is None:
+        user = current_user
+    else:
+        if not current_user.is_admin and email != current_user.email:
+            abort(401)
+        user = Account.query.get_or_404(email)
+
+    if 'at' not in request.args:
+        return jsonify(user.balance)
+
+    try:
+        moment = datetime.fromisoformat(request.args['at'])
+    except ValueError:
+        abort(400, {'message': 'The datetime must be in ISO format with timezone.'})
+
+    if moment.tzinfo is None:
+        abort(400, {'message': 'The timezone must be passed.'})
+
+    return jsonify(balance_as_of(user.email, moment))
 
 
 @api.route('/accounts/<string:email>/balance', methods=['PATCH'])
@@ -177,9 +258,103 @@ def change_balance(email):
     return NO_PAYLOAD
 
 
+@allow_no_json
+@api.route('/accounts/balance', methods=['POST'])
+@admin_required
+def change_balances():
+    """Change the balances of many users at once.
+
+    The changes are passed either as a JSON list of objects with `email` and `change`
+    or as CSV rows of `email,change` (optionally with a header). The valid changes are
+    applied together and a result is reported for each of the passed rows."""
+    changes = _requested_balance_changes()
+    if len(changes) > MAX_BULK_CHANGES:
+        abort(400, {'message': f'At most {MAX_BULK_CHANGES} changes may be passed at once.'})
+
+    emails = {email for (email, _change) in changes if email}
+    existing = {email for (email,) in db.session.query(Account.email)
+                                                .filter(Account.email.in_(emails))}
+
+    results = []
+    to_apply = []
+    for row, (email, change) in enumerate(changes):
+        result = {'row': row, 'email': email, 'change': change}
+        if not email or change is None:
+            result.update(status='invalid',
+                          message='The e-mail and an integer change must be specified.')
+        elif email not in existing:
+            result.update(status='invalid', message='The account does not exist.')
+        elif change == 0:
+            result.update(status='skipped')
+        else:
+            result.update(status='applied')
+            to_apply.append(result)
+        results.append(result)
+
+    if to_apply:
+        try:
+            transaction_ids = db.session.execute(
+                Transaction.__table__.insert()
+                .values([{'account_email': result['email'], 'change': result['change']}
+                         for result in to_apply])
+                .returning(Transaction.id)
+            ).fetchall()
+            db.session.commit()
+        except IntegrityError as err:
+            db.session.rollback()
+            log.exception(err)
+            abort(400, {'message': 'Data integrity violated.'})
+
+        for result, (transaction_id,) in zip(to_apply, transaction_ids):
+            result['transaction_id'] = transaction_id
+        notify_each(NotificationType.manual_transaction, [
+            (result['email'], {'transaction_id': result['transaction_id']})
+            for result in to_apply
+        ])
+
+    return jsonify(applied=len(to_apply), results=results)
+
+
+def _requested_balance_changes():
+    """Read the (email, change) pairs from the JSON or CSV body of the request.
+    The invalid values are replaced with None to be reported for their rows."""
+    if request.mimetype == 'text/csv':
+        try:
+            rows = [row for row in csv.reader(io.StringIO(request.get_data(as_text=True))) if row]
+        except csv.Error as err:
+            abort(400, {'message': f'The CSV is malformed: {err}.'})
+        if rows and rows[0][0].strip().lower() == 'email':
+            rows = rows[1:]
+
+        changes = []
+        for row in rows:
+            try:
+                change = int(row[1]) if len(row) == 2 else None
+            except ValueError:
+                change = None
+            changes.append((row[0].strip() or None, change))
+        return changes
+
+    if not request.is_json:
+        abort(400, {'message': 'The changes should be passed in JSON or CSV.'})
+    if not isinstance(request.json, list):
+        abort(400, {'message': 'The changes should be passed as a list.'})
+
+    changes = []
+    for item in request.json:
+        if not isinstance(item, dict):
+            item = {}
+        email, change = item.get('email'), item.get('change')
+        changes.append((email if isinstance(email, str) else None,
+                        change if isinstance(change, int) and not isinstance(change, bool)
+                        else None))
+    return changes
+
+
 @api.route('/account/timeline', defaults={'email': None})
 @api.route('/accounts/<email>/timeline')
 @login_required
+@replica_safe
 def get_timeline(email):
     """Get the timeline of the account.
     If the e-mail is not passed, return own timeline."""
@@ -212,106 +387,88 @@ def get_timeline(email):
     else:
         end_date = tz_aware_now()
 
-    # pylint: disable=bad-continuation, invalid-unary-operand-type
-
-    applications = (
-        db.session
-            .query(Application.id.label('application_id'),
-                   Application.status.label('application_status'))
-            .add_column(Application.application_time.label('entry_time'))
-            .filter_by(applicant=user)
-            .join(Activity).add_columns(Activity.name.label('activity_name'),
-                                        Activity.id.label('activity_id'))
-            .filter(~Activity.internal)
-            .join(Project).add_columns(Project.name.label('project_name'),
-                                       Project.id.label('project_id'),
-                                       Project.lifetime_stage.label('project_stage'))
-            .outerjoin(Feedback).add_column(Feedback.application_id.label('feedback_id'))
-            .add_column((Application.actual_hours * Activity.reward_rate).label('reward'))
-    )
-
-    purchases = (
-        db.session
-            .query(StockChange.id.label('stock_change_id'),
-                   StockChange.status.label('stock_change_status'),
-                   StockChange.time.label('entry_time'))
-            .filter_by(account=user)
-            .filter(StockChange.amount < 0)
-            .join(Variety).join(Product).add_columns(Product.id.label('product_id'),
-                                                     Product.name.label('product_name'),
-                                                     Product.type.label('product_type'))
-    )
-
-    promotions = (
-        # pylint: disable=unsubscriptable-object
+    limit = requested_limit()
+    cursor = requested_cursor((datetime, int))
+
+    moderation_activity = db.aliased(Activity)
+    moderation_application = db.aliased(Application)
+    payload = db.case([
+        (TimelineEvent.type == TimelineEventType.application, jsonb_object(
+            application_id=Application.id,
+            application_status=Application.status,
+            activity_name=Activity.name,
+            activity_id=Activity.id,
+            project_name=Project.name,
+            project_id=Project.id,
+            project_stage=Project.lifetime_stage,
+            feedback_id=Feedback.application_id,
+            reward=Application.actual_hours * Activity.reward_rate,
+        )),
+        (TimelineEvent.type == TimelineEventType.purchase, jsonb_object(
+            stock_change_id=StockChange.id,
+            stock_change_status=StockChange.status,
+            product_id=Product.id,
+            product_name=Product.name,
+            product_type=Product.type,
+        )),
+        (TimelineEvent.type == TimelineEventType.promotion, jsonb_object(
+            project_id=Project.id,
+            project_name=Project.name,
+            application_id=moderation_application.id,
+        )),
+    ], else_=jsonb_object(
+        project_id=Project.id,
+        project_name=Project.name,
+        review_status=Project.review_status,
+    ))
+
+    # pylint: disable=bad-continuation
+    timeline = (
         db.session
-            .query(Notification.payload['project_id'].label('project_id'),
-                   Notification.timestamp.label('entry_time'))
-            .filter_by(recipient_email=user.email, type=NotificationType.added_as_moderator)
-            .join(Project,
-                  Project.id == Notification.payload.op('->>')('project_id').cast(db.Integer))
-            .filter(Project.creator != user, Project.lifetime_stage != LifetimeStage.draft)
-            .add_column(Project.name.label('project_name'))
-            .outerjoin(Activity, (Activity.project_id == Project.id)
-                               & (Activity.internal)
-                               & (Activity.name == '[[Moderation]]'))
-            .outerjoin(Application, (Application.activity_id == Activity.id)
-                                  & (Application.applicant == user))
-            .add_column(Application.id.label('application_id'))
+            .query(TimelineEvent.entry_time,
+                   db.cast(TimelineEvent.type, db.Text).label('type'),
+                   payload.label('payload'),
+                   TimelineEvent.id)
+            .filter(TimelineEvent.account_email == user.email,
+                    TimelineEvent.entry_time >= start_date,
+                    TimelineEvent.entry_time <= end_date)
+            .outerjoin(Application, Application.id == TimelineEvent.application_id)
+            .outerjoin(Activity, Activity.id == Application.activity_id)
+            .outerjoin(Feedback, Feedback.application_id == Application.id)
+            .outerjoin(StockChange, StockChange.id == TimelineEvent.stock_change_id)
+            .outerjoin(Variety, Variety.id == StockChange.variety_id)
+            .outerjoin(Product, Product.id == Variety.product_id)
+            .outerjoin(Project, Project.id == TimelineEvent.project_id)
+            .outerjoin(moderation_activity,
+                       (TimelineEvent.type == TimelineEventType.promotion)
+                       & (moderation_activity.project_id == TimelineEvent.project_id)
+                       & (moderation_activity.internal)
+                       & (moderation_activity.name == '[[Moderation]]'))
+            .outerjoin(moderation_application,
+                       (moderation_application.activity_id == moderation_activity.id)
+                       & (moderation_application.applicant_email == TimelineEvent.account_email))
+            .order_by(TimelineEvent.entry_time.desc(), TimelineEvent.id.desc())
     )
+    if cursor is not None:
+        timeline = timeline.filter(
+            db.tuple_(TimelineEvent.entry_time, TimelineEvent.id) < db.tuple_(*cursor)
+        )
 
-    projects = (
-        db.session
-            .query(Project.id.label('project_id'),
-                   Project.name.label('project_name'),
-                   Project.review_status,
-                   Project.creation_time.label('entry_time'))
-            .filter_by(creator=user)
-            .filter(Project.lifetime_stage != LifetimeStage.draft)
-    )
+    events = timeline.limit(limit + 1).all()
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_cursor(events[-1].entry_time, events[-1].id)
 
-    timeline = (
-        subquery_to_events(
-            applications.filter(Application.application_time >= start_date,
-                                Application.application_time <= end_date).subquery(),
-            'application'
-        )
-        .union(subquery_to_events(
-            purchases.filter(StockChange.time >= start_date,
-                             StockChange.time <= end_date).subquery(),
-            'purchase'
-        ))
-        .union(subquery_to_events(
-            promotions.filter(Notification.timestamp >= start_date,
-                              Notification.timestamp <= end_date).subquery(),
-            'promotion'
-        ))
-        .union(subquery_to_events(
-            projects.filter(Project.creation_time >= start_date,
-                            Project.creation_time <= end_date).subquery(),
-            'project'
-        ))
-    ).order_by(db.desc('entry_time'))
-
-    leftover_applications = db.session.query(
-        applications.filter(Application.application_time <= start_date).exists()
-    ).scalar()
-    leftover_purchases = db.session.query(
-        purchases.filter(StockChange.time <= start_date).exists()
-    ).scalar()
-    leftover_promotions = db.session.query(
-        promotions.filter(Notification.timestamp <= start_date).exists()
-    ).scalar()
-    leftover_projects = db.session.query(
-        projects.filter(Project.creation_time <= start_date).exists()
+    more = next_cursor is not None or db.session.query(
+        TimelineEvent.query.filter(TimelineEvent.account_email == user.email,
+                                   TimelineEvent.entry_time < start_date).exists()
     ).scalar()
 
     out_schema = TimelineSchema(many=True)
-    return jsonify(data=out_schema.dump(timeline.all()),
-                   more=any((leftover_applications,
-                             leftover_purchases,
-                             leftover_promotions,
-                             leftover_projects)))
+    return jsonify(data=out_schema.dump(events),
+                   more=more,
+                   next_cursor=next_cursor)
 
 
 @api.route('/account/statistics', defaults={'email': None})
@@ -327,6 +484,7 @@ def get_statistics(email):
             abort(401)
         user = Account.query.get_or_404(email)
 
+    start_date = end_date = None
     if 'start_date' in request.args:
         try:
             start_date = datetime.fromisoformat(request.args['start_date'])
@@ -335,8 +493,6 @@ def get_statistics(email):
 
         if start_date.tzinfo is None:
             abort(400, {'message': 'The timezone must be passed.'})
-    else:
-        start_date = unix_epoch
 
     if 'end_date' in request.args:
         try:
@@ -346,44 +502,8 @@ def get_statistics(email):
 
         if end_date.tzinfo is None:
             abort(400, {'message': 'The timezone must be passed.'})
-    else:
-        end_date = tz_aware_now()
-
-    volunteering = (
-        # pylint: disable=bad-continuation, invalid-unary-operand-type
-        db.session.query(db.func.sum(Application.actual_hours),
-                         db.func.count(Application.id))
-            .filter_by(applicant=user, status=ApplicationStatus.approved)
-            .filter(Application.application_time >= start_date)
-            .filter(Application.application_time <= end_date)
-            .join(Activity).filter(~Activity.fixed_reward, ~Activity.internal)
-            .join(Project).filter(Project.lifetime_stage == LifetimeStage.finished)
-    ).one()
-
-    rating = (
-        # pylint: disable=bad-continuation
-        db.session.query(db.func.avg(VolunteeringReport.rating))
-            .join(Application).filter_by(applicant=user, status=ApplicationStatus.approved)
-            .filter(Application.application_time >= start_date)
-            .filter(Application.application_time <= end_date)
-    ).scalar()
 
-    competences = (
-        # pylint: disable=bad-continuation
-        db.session.query(db.func.count(feedback_competence.c.feedback_id),
-                         feedback_competence.c.competence_id)
-            .group_by(feedback_competence.c.competence_id)
-            .join(Feedback).join(Application).filter_by(applicant=user)
-            .filter(Application.application_time >= start_date)
-            .filter(Application.application_time <= end_date)
-            .join(Competence).add_column(Competence.name).group_by(Competence.name)
-    ).all()
-
-    return jsonify(hours=volunteering[0] or 0,
-                   positions=volunteering[1],
-                   rating=float(rating or 0),
-                   competences=[dict(zip(('amount', 'id', 'name'), competence))
-                                for competence in competences])
+    return jsonify(**account_statistics(user.email, start_date, end_date))
 
 
 @api.route('/account/notification_settings', defaults={'email': None})
@@ -487,33 +607,30 @@ def reclaim_innopoints():
     if 'email' not in request.json or 'password' not in request.json:
         abort(400, {'message': 'Email/username and password should be specified.'})
 
-    conn = sqlite3.connect('db.sqlite3')
-    conn.row_factory = lambda c, r: dict(sqlite3.Row(c, r))
-    cur = conn.cursor()
-    cur.execute('SELECT email, password, points FROM User WHERE email=? OR username=?;',
-                (request.json['email'],)*2)
-    user = cur.fetchone()
+    # The row stays locked until the commit, so the points can't be reclaimed twice
+    legacy_account = LegacyAccount.query.filter(
+        or_(LegacyAccount.email == request.json['email'],
+            LegacyAccount.username == request.json['email'])
+    ).with_for_update().first()
 
-    if user is None:
+    if legacy_account is None:
         abort(403, {'message': 'This email/username is not associated with any account.'})
 
-    if not check_password_hash(user['password'], request.json['password']):
+    if not check_password_hash(legacy_account.password, request.json['password']):
         abort(403, {'message': 'Incorrect password.'})
 
-    if user['points'] != 0:
+    points = legacy_account.points
+    if points != 0:
         new_transaction = Transaction(account=current_user,
-                                      change=user['points'])
+                                      change=points)
         db.session.add(new_transaction)
-        try:
-            db.session.commit()
-        except IntegrityError as err:
-            db.session.rollback()
-            log.exception(err)
-            abort(400, {'message': 'Data integrity violated.'})
+    db.session.delete(legacy_account)
 
-    cur.execute('DELETE FROM User WHERE email=?;', (user['email'],))
-    conn.commit()
-    cur.close()
-    conn.close()
+    try:
+        db.session.commit()
+    except IntegrityError as err:
+        db.session.rollback()
+        log.exception(err)
+        abort(400, {'message': 'Data integrity violated.'})
 
-    return jsonify(user['points'])
+    return jsonify(points)
@@ -25,6 +25,7 @@ from innopoints.extensions import db
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort, allow_no_json, admin_required
 from innopoints.core.notifications import remove_notifications
+from innopoints.core.statistics import refresh_project_summary
 from innopoints.models import (
     Activity,
     ApplicationStatus,
@@ -33,7 +34,7 @@ from innopoints.models import (
     LifetimeStage,
     Project,
 )
-from innopoints.schemas import ActivitySchema, CompetenceSchema
+from innopoints.schemas import ActivitySchema, CompetenceSchema, get_schema, schema_context
 
 NO_PAYLOAD = ('', 204)
 log = logging.getLogger(__name__)
@@ -67,15 +68,16 @@ def create_activity(project_id):
 
     try:
         db.session.add(new_activity)
+        refresh_project_summary(project_id)
         db.session.commit()
     except IntegrityError as err:
         db.session.rollback()
         log.exception(err)
         abort(400, {'message': 'Data integrity violated.'})
 
-    out_schema = ActivitySchema(exclude=('existing_application',),
-                                context={'user': current_user})
-    return out_schema.jsonify(new_activity)
+    out_schema = get_schema(ActivitySchema, exclude=('existing_application',))
+    with schema_context(user=current_user):
+        return out_schema.jsonify(new_activity)
 
 
 class ActivityAPI(MethodView):
@@ -134,15 +136,16 @@ class ActivityAPI(MethodView):
 
         try:
             db.session.add(updated_activity)
+            refresh_project_summary(project_id)
             db.session.commit()
         except IntegrityError as err:
             db.session.rollback()
             log.exception(err)
             abort(400, {'message': 'Data integrity violated.'})
 
-        out_schema = ActivitySchema(exclude=('existing_application',),
-                                    context={'user': current_user})
-        return out_schema.jsonify(updated_activity)
+        out_schema = get_schema(ActivitySchema, exclude=('existing_application',))
+        with schema_context(user=current_user):
+            return out_schema.jsonify(updated_activity)
 
     @login_required
     def delete(self, project_id, activity_id):
@@ -164,6 +167,7 @@ class ActivityAPI(MethodView):
         db.session.delete(activity)
 
         try:
+            refresh_project_summary(project_id)
             db.session.commit()
             remove_notifications({
                 'activity_id': activity_id,
@@ -277,9 +281,11 @@ class CompetenceAPI(MethodView):
     def delete(self, compt_id):
         """Delete the competence."""
         competence = Competence.query.get_or_404(compt_id)
+        project_ids = [activity.project_id for activity in competence.activities]
 
         try:
             db.session.delete(competence)
+            refresh_project_summary(*project_ids)
             db.session.commit()
         except IntegrityError as err:
             db.session.rollback()
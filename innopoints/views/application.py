@@ -26,6 +26,7 @@ from sqlalchemy.exc import IntegrityError
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort
 from innopoints.core.notifications import notify, notify_all, remove_notifications
+from innopoints.core.statistics import refresh_account_summary, refresh_project_summary
 from innopoints.core.timezone import tz_aware_now
 from innopoints.extensions import db
 from innopoints.models import (
@@ -38,6 +39,8 @@ from innopoints.models import (
     NotificationType,
     Project,
     project_moderation,
+    TimelineEvent,
+    TimelineEventType,
     Transaction,
     VolunteeringReport,
 )
@@ -82,6 +85,10 @@ def apply_for_activity(project_id, activity_id):
                                   actual_hours=activity.working_hours,
                                   status=ApplicationStatus.pending)
     db.session.add(new_application)
+    db.session.add(TimelineEvent(type=TimelineEventType.application,
+                                 account_email=current_user.email,
+                                 application=new_application,
+                                 project=project))
     try:
         db.session.commit()
     except IntegrityError as err:
@@ -116,6 +123,9 @@ def take_back_application(project_id, activity_id):
 
     db.session.delete(application)
     try:
+        if application.status == ApplicationStatus.approved:
+            refresh_account_summary(application.applicant_email)
+            refresh_project_summary(project_id)
         db.session.commit()
         remove_notifications({
             'application_id': application.id,
@@ -173,6 +183,9 @@ def edit_application(project_id, activity_id, application_id):
         application.actual_hours = actual_hours
 
     try:
+        if application.status != old_status:
+            refresh_account_summary(application.applicant_email)
+            refresh_project_summary(project_id)
         db.session.commit()
     except IntegrityError as err:
         db.session.rollback()
@@ -268,6 +281,7 @@ class VolunteeringReportAPI(MethodView):
 
         try:
             db.session.add(new_report)
+            refresh_account_summary(application.applicant_email)
             db.session.commit()
         except IntegrityError as err:
             db.session.rollback()
@@ -311,6 +325,7 @@ class VolunteeringReportAPI(MethodView):
 
         try:
             db.session.add(updated_report)
+            refresh_account_summary(application.applicant_email)
             db.session.commit()
         except IntegrityError as err:
             db.session.rollback()
@@ -348,6 +363,7 @@ class VolunteeringReportAPI(MethodView):
         ).first_or_404()
         try:
             db.session.delete(report)
+            refresh_account_summary(application.applicant_email)
             db.session.commit()
         except IntegrityError as err:
             db.session.rollback()
@@ -417,6 +433,7 @@ def leave_feedback(project_id, activity_id, application_id):
         notification.is_read = True
 
     try:
+        refresh_account_summary(application.applicant_email)
         db.session.commit()
     except IntegrityError as err:
         db.session.rollback()
@@ -10,11 +10,10 @@ from urllib.parse import urljoin
 
 from flask import current_app, url_for, redirect, session, request
 from flask_login import login_user, logout_user
-from authlib.common.errors import AuthlibBaseError
-from authlib.jose.errors import MissingClaimError, InvalidClaimError
 
 from innopoints.blueprints import auth
 from innopoints.core.helpers import abort
+from innopoints.core.statistics import refresh_student_groups
 from innopoints.extensions import oauth, db
 from innopoints.models import Account
 
@@ -36,6 +35,10 @@ def login():
 @auth.route('/authorize')
 def authorize():
     """Catch the user after the back-redirect and fetch the essential info."""
+    # pylint: disable=import-outside-toplevel
+    from authlib.common.errors import AuthlibBaseError
+    from authlib.jose.errors import MissingClaimError, InvalidClaimError
+
     try:
         token = oauth.innopolis_sso.authorize_access_token(
             redirect_uri=url_for('auth.authorize', _external=True))
@@ -55,17 +58,22 @@ def authorize():
                        group=userinfo.get('role'),
                        is_admin=should_be_admin)
         db.session.add(user)
+        refresh_student_groups(user.group)
         db.session.commit()
 
     if user.full_name != userinfo['commonname']:
         user.full_name = userinfo['commonname']
 
+    old_group, was_admin = user.group, user.is_admin
     if user.group != userinfo.get('role'):
         user.group = userinfo.get('role')
 
     if user.is_admin != should_be_admin:
         user.is_admin = should_be_admin
 
+    if user.group != old_group or user.is_admin != was_admin:
+        refresh_student_groups(old_group, user.group)
+
     db.session.commit()
 
     login_user(user, remember=True)
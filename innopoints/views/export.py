@@ -0,0 +1,150 @@
+"""Views exporting the data of many accounts at once.
+
+- GET /export/accounts
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from flask import Response, request, stream_with_context
+
+from innopoints.blueprints import api
+from innopoints.core.helpers import abort, admin_required
+from innopoints.core.ledger import balances_as_of
+from innopoints.core.replica import replica_safe
+from innopoints.core.timezone import tz_aware_now, unix_epoch
+from innopoints.extensions import db
+from innopoints.models import (
+    Account,
+    Activity,
+    Application,
+    ApplicationStatus,
+    LifetimeStage,
+    Project,
+    StockChange,
+    Transaction,
+)
+
+# The rows are fetched from a server-side cursor and sent in batches of this size
+EXPORT_BATCH_SIZE = 500
+EXPORT_COLUMNS = ('email', 'full_name', 'group', 'balance', 'hours', 'purchases', 'spent')
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def _format_csv(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def _format_jsonl(rows, header=False):  # pylint: disable=unused-argument
+    return ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in rows)
+
+
+@api.route('/export/accounts')
+@admin_required
+@replica_safe
+def export_accounts():
+    """Stream the balance, the volunteering hours and the purchases of each account
+    as CSV or JSON lines. The hours and the purchases are counted within the date range,
+    the balance is taken at its end."""
+    if 'start_date' in request.args:
+        try:
+            start_date = datetime.fromisoformat(request.args['start_date'])
+        except ValueError:
+            abort(400, {'message': 'The datetime must be in ISO format with timezone.'})
+
+        if start_date.tzinfo is None:
+            abort(400, {'message': 'The timezone must be passed.'})
+    else:
+        start_date = unix_epoch
+
+    if 'end_date' in request.args:
+        try:
+            end_date = datetime.fromisoformat(request.args['end_date'])
+        except ValueError:
+            abort(400, {'message': 'The datetime must be in ISO format with timezone.'})
+
+        if end_date.tzinfo is None:
+            abort(400, {'message': 'The timezone must be passed.'})
+    else:
+        end_date = tz_aware_now()
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        abort(400, {'message': f'The format must be one of: {", ".join(EXPORT_FORMATS)}.'})
+    student_groups = request.args.getlist('group')
+
+    balances = balances_as_of(end_date).alias('balances')
+
+    hours = (
+        # pylint: disable=bad-continuation, invalid-unary-operand-type
+        db.select([Application.applicant_email,
+                   db.func.sum(Application.actual_hours).label('hours')])
+            .select_from(db.join(Application, Activity).join(Project))
+            .where(db.and_(Application.status == ApplicationStatus.approved,
+                           Application.application_time >= start_date,
+                           Application.application_time <= end_date,
+                           ~Activity.fixed_reward,
+                           ~Activity.internal,
+                           Project.lifetime_stage == LifetimeStage.finished))
+            .group_by(Application.applicant_email)
+    ).alias('hours')
+
+    purchases = (
+        # pylint: disable=bad-continuation
+        db.select([Transaction.account_email,
+                   db.func.count(StockChange.id).label('purchases'),
+                   (-db.func.sum(Transaction.change)).label('spent')])
+            .select_from(db.join(Transaction, StockChange,
+                                 StockChange.id == Transaction.stock_change_id))
+            .where(db.and_(StockChange.time >= start_date,
+                           StockChange.time <= end_date))
+            .group_by(Transaction.account_email)
+    ).alias('purchases')
+
+    accounts = (
+        # pylint: disable=bad-continuation
+        db.select([Account.email,
+                   Account.full_name,
+                   Account.group,
+                   db.func.coalesce(balances.c.balance, 0),
+                   db.func.coalesce(hours.c.hours, 0),
+                   db.func.coalesce(purchases.c.purchases, 0),
+                   db.func.coalesce(purchases.c.spent, 0)])
+            .select_from(Account.__table__
+                .outerjoin(balances, balances.c.account_email == Account.email)
+                .outerjoin(hours, hours.c.applicant_email == Account.email)
+                .outerjoin(purchases, purchases.c.account_email == Account.email))
+            .order_by(Account.email)
+            .execution_options(stream_results=True)
+    )
+    if student_groups:
+        accounts = accounts.where(Account.group.in_(student_groups))
+
+    format_rows = _format_csv if export_format == 'csv' else _format_jsonl
+
+    def generate():
+        result = db.session.execute(accounts)
+        try:
+            header = True
+            while True:
+                rows = result.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows and not header:
+                    break
+                yield format_rows(rows, header=header)
+                header = False
+        finally:
+            result.close()
+
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=accounts.{export_format}'
+    return response
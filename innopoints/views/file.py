@@ -13,13 +13,13 @@ import requests
 import werkzeug
 from flask import jsonify, request, current_app
 from flask_login import login_required, current_user
-from PIL import Image
 from sqlalchemy.exc import IntegrityError
 
 from innopoints.blueprints import api
 from innopoints.core.file_manager import file_manager
 from innopoints.core.helpers import abort, allow_no_json
 from innopoints.core.image import crop, shrink
+from innopoints.core.metrics import IMAGE_PROCESSING
 from innopoints.extensions import db
 from innopoints.models import StaticFile
 
@@ -54,12 +54,15 @@ def upload_file():
     if mimetype not in ALLOWED_MIMETYPES:
         abort(400, {'message': f'Mimetype "{mimetype}" is not allowed.'})
 
-    image = shrink(
-        crop(
-            Image.open(file.stream),
-            request.form
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    with IMAGE_PROCESSING.time():
+        image = shrink(
+            crop(
+                Image.open(file.stream),
+                request.form
+            )
         )
-    )
 
     new_file = StaticFile(mimetype='image/webp', owner=current_user)
     db.session.add(new_file)
@@ -0,0 +1,26 @@
+"""Views reporting the health of the service.
+
+- GET /ready
+"""
+
+import logging
+
+from flask import jsonify
+import sqlalchemy.exc
+
+from innopoints.blueprints import service
+from innopoints.extensions import db
+
+log = logging.getLogger(__name__)
+
+
+@service.route('/ready')
+def check_readiness():
+    """Report whether the service can handle requests, that is, the database is reachable."""
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except sqlalchemy.exc.SQLAlchemyError as exc:
+        log.warning('The readiness check failed: %s', exc)
+        db.session.rollback()
+        return jsonify(status='unavailable'), 503
+    return jsonify(status='ready')
@@ -0,0 +1,29 @@
+"""Views exposing the service metrics.
+
+- GET /metrics
+"""
+
+import hmac
+
+from flask import current_app, request
+
+from innopoints.blueprints import service
+from innopoints.core import metrics
+from innopoints.core.helpers import abort
+
+
+@service.route('/metrics')
+def export_metrics():
+    """Return the application metrics in the Prometheus text format.
+
+    The scraper has to pass METRICS_TOKEN as a bearer token. Without the token configured,
+    the metrics are not exposed at all."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        abort(404)
+
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+
+    body, content_type = metrics.export()
+    return body, 200, {'Content-Type': content_type}
@@ -1,21 +1,25 @@
 """Views related to notifications.
 
-- GET   /notifications
-- POST  /notifications/subscribe
-- PATCH /notifications/{notification_id}/read
+- GET    /notifications
+- POST   /notifications/subscribe
+- DELETE /notifications/subscribe
+- PATCH  /notifications/{notification_id}/read
 """
 
 import logging
 
 from flask import request
 from flask_login import login_required, current_user
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import DataError, IntegrityError
 
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort, allow_no_json
-from innopoints.core.notifications.push import subscribe as subscribe_to_push
+from innopoints.core.notifications.push import (
+    subscribe as subscribe_to_push,
+    unsubscribe as unsubscribe_from_push,
+)
 from innopoints.extensions import db, push
-from innopoints.models import Notification
+from innopoints.models import Notification, PushSubscription
 from innopoints.schemas import NotificationSchema
 
 NO_PAYLOAD = ('', 204)
@@ -43,17 +47,28 @@ def subscribe():
     """Adds the user's subscription to push notifications."""
     new_subscription = request.json
 
-    if 'endpoint' not in new_subscription:
+    if not isinstance(new_subscription, dict) or 'endpoint' not in new_subscription:
         abort(400, {'message': 'The endpoint must be specified.'})
 
     if ('keys' not in new_subscription
+            or not isinstance(new_subscription['keys'], dict)
             or 'auth' not in new_subscription['keys']
             or 'p256dh' not in new_subscription['keys']):
         abort(400, {'message': 'Encryption keys must be specified.'})
 
+    columns = PushSubscription.__table__.c
+    for value, column in ((new_subscription['endpoint'], columns.endpoint),
+                          (new_subscription['keys']['p256dh'], columns.p256dh),
+                          (new_subscription['keys']['auth'], columns.auth)):
+        if not isinstance(value, str):
+            abort(400, {'message': f'The {column.name} must be a string.'})
+        if column.type.length is not None and len(value) > column.type.length:
+            abort(400, {'message': f'The {column.name} must be at most '
+                                   f'{column.type.length} characters long.'})
+
     try:
         subscribe_to_push(current_user, new_subscription)
-    except IntegrityError:
+    except (IntegrityError, DataError):
         abort(400, {'message': 'Data integrity violated.'})
 
     push.send(new_subscription, {
@@ -64,6 +79,24 @@ def subscribe():
     return NO_PAYLOAD
 
 
+@api.route('/notifications/subscribe', methods=['DELETE'])
+@login_required
+def unsubscribe():
+    """Removes the user's subscription to push notifications.
+    If the endpoint is not passed, removes all of the user's subscriptions."""
+    body = request.get_json(silent=True)
+    if body is None:
+        body = {}
+    if not isinstance(body, dict):
+        abort(400, {'message': 'The body must be a JSON object.'})
+    endpoint = body.get('endpoint')
+    if endpoint is not None and not isinstance(endpoint, str):
+        abort(400, {'message': 'The endpoint must be a string.'})
+
+    unsubscribe_from_push(current_user, endpoint)
+    return NO_PAYLOAD
+
+
 @allow_no_json
 @api.route('/notifications/<int:notification_id>/read', methods=['PATCH'])
 @login_required
@@ -11,7 +11,7 @@ Product:
 import json
 import logging
 import math
-from datetime import date
+from datetime import date, datetime
 
 from flask import request, jsonify
 from flask.views import MethodView
@@ -21,8 +21,19 @@ from sqlalchemy import or_
 from sqlalchemy.exc import IntegrityError
 
 from innopoints.blueprints import api
+from innopoints.core.fieldsets import loader_options, requested_fields
 from innopoints.core.helpers import abort, admin_required
 from innopoints.core.notifications import notify_all, remove_notifications
+from innopoints.core.pagination import (
+    count_rows,
+    encode_cursor,
+    keyset_filter,
+    requested_count_mode,
+    requested_cursor,
+    requested_limit,
+)
+from innopoints.core.replica import replica_safe
+from innopoints.core.sql_rendering import render_products, sql_rendering_enabled
 from innopoints.extensions import db
 from innopoints.models import (
     Account,
@@ -33,13 +44,14 @@ from innopoints.models import (
     StockChangeStatus,
     Variety,
 )
-from innopoints.schemas import ProductSchema
+from innopoints.schemas import get_schema, ProductSchema
 
 NO_PAYLOAD = ('', 204)
 log = logging.getLogger(__name__)
 
 
 @api.route('/products')
+@replica_safe
 def list_products():
     """List products available in InnoStore."""
     # pylint: disable=bad-continuation, invalid-unary-operand-type
@@ -53,21 +65,27 @@ def list_products():
             .group_by(StockChange.variety_id).subquery()
     )
     color_array = db.func.ARRAY_AGG(Variety.color)
+    total_purchases = -db.func.sum(purchases.c.variety_purchases)
     default_limit = 24
     default_page = 1
     default_order_by = 'addition_time'
     default_order = 'desc'
     ordering = {
-        ('addition_time', 'asc'): Product.addition_time.asc(),
-        ('addition_time', 'desc'): Product.addition_time.desc(),
-        ('price', 'asc'): Product.price.asc(),
-        ('price', 'desc'): Product.price.desc(),
-        ('purchases', 'asc'): db.nullsfirst(db.asc(-db.func.sum(purchases.c.variety_purchases))),
-        ('purchases', 'desc'): db.nullslast(db.desc(-db.func.sum(purchases.c.variety_purchases))),
+        ('addition_time', 'asc'): (Product.addition_time.asc(), Product.id.asc()),
+        ('addition_time', 'desc'): (Product.addition_time.desc(), Product.id.desc()),
+        ('price', 'asc'): (Product.price.asc(), Product.id.asc()),
+        ('price', 'desc'): (Product.price.desc(), Product.id.desc()),
+        ('purchases', 'asc'): (db.nullsfirst(db.asc(total_purchases)),),
+        ('purchases', 'desc'): (db.nullslast(db.desc(total_purchases)),),
+    }
+    # The sort keys that the pages can be requested by cursor for, with their types
+    keysets = {
+        'addition_time': ((Product.addition_time, Product.id), (datetime, int)),
+        'price': ((Product.price, Product.id), (int, int)),
     }
 
+    limit = requested_limit(default_limit)
     try:
-        limit = int(request.args.get('limit', default_limit))
         page = int(request.args.get('page', default_page))
         order_by = request.args.get('order_by', default_order_by)
         order = request.args.get('order', default_order)
@@ -84,12 +102,19 @@ def list_products():
         all(item is None or isinstance(item, str) for item in excluded_colors):
         abort(400, {'message': 'Excluded colors has to be an array of strings and possibly null.'})
 
-    if limit < 1 or page < 1:
+    if page < 1:
         abort(400, {'message': 'Limit and page number must be positive.'})
 
     if (order_by, order) not in ordering:
         abort(400, {'message': 'Invalid ordering specified.'})
 
+    cursor = None
+    if 'cursor' in request.args:
+        if order_by not in keysets:
+            abort(400, {'message': f'Cursors are not supported when ordering by {order_by}.'})
+        cursor = requested_cursor(keysets[order_by][1])
+    count_mode = requested_count_mode('none' if cursor is not None else 'exact')
+
     db_query = Product.query
     if 'q' in request.args:
         like_query = f'%{request.args["q"]}%'
@@ -113,7 +138,7 @@ def list_products():
     if max_price is not None:
         db_query = db_query.filter(Product.price <= max_price)
 
-    count = db.session.query(db_query.subquery()).count()
+    count = count_rows(db_query, count_mode)
     if order_by == 'purchases':
         if excluded_colors:
             abort(400, {'message': 'Ordering by purchases is not allowed when filtering.'})
@@ -124,15 +149,39 @@ def list_products():
         )
 
 
-    db_query = db_query.order_by(ordering[order_by, order])
-    db_query = db_query.offset(limit * (page - 1)).limit(limit)
-
-    schema = ProductSchema(many=True, exclude=('description',
-                                               'varieties.stock_changes',
-                                               'varieties.product',
-                                               'varieties.product_id'))
-    return jsonify(pages=math.ceil(count / limit),
-                   data=schema.dump(db_query.all()))
+    db_query = db_query.order_by(*ordering[order_by, order])
+    if cursor is not None:
+        db_query = db_query.filter(
+            keyset_filter(keysets[order_by][0], cursor, descending=order == 'desc')
+        )
+    else:
+        db_query = db_query.offset(limit * (page - 1))
+    db_query = db_query.limit(limit + 1)
+    pages = None if count is None else math.ceil(count / limit)
+
+    def next_cursor(products):
+        """Return the cursor of the page after the given one, if there is such a page."""
+        if len(products) <= limit or order_by not in keysets:
+            return None
+        return encode_cursor(*(getattr(products[limit - 1], column.key)
+                               for column in keysets[order_by][0]))
+
+    fields = requested_fields(ProductSchema)
+    if fields is None and sql_rendering_enabled():
+        keys = db_query.with_entities(Product.id, Product.addition_time, Product.price).all()
+        product_ids = dict.fromkeys(row[0] for row in keys[:limit])
+        return render_products(list(product_ids), pages=pages, next_cursor=next_cursor(keys))
+
+    db_query = db_query.options(*loader_options(Product, fields))
+
+    schema = get_schema(ProductSchema, many=True, only=fields, exclude=('description',
+                                                                        'varieties.stock_changes',
+                                                                        'varieties.product',
+                                                                        'varieties.product_id'))
+    products = db_query.all()
+    return jsonify(pages=pages,
+                   data=schema.dump(products[:limit]),
+                   next_cursor=next_cursor(products))
 
 
 @api.route('/products', methods=['POST'])
@@ -180,11 +229,11 @@ def create_product():
         users = Account.query.filter_by(is_admin=False).all()
         notify_all(users, NotificationType.new_arrivals)
 
-    out_schema = ProductSchema(exclude=('varieties.product_id',
-                                        'varieties.product',
-                                        'varieties.images.variety_id',
-                                        'varieties.images.id',
-                                        'varieties.stock_changes'))
+    out_schema = get_schema(ProductSchema, exclude=('varieties.product_id',
+                                                    'varieties.product',
+                                                    'varieties.images.variety_id',
+                                                    'varieties.images.id',
+                                                    'varieties.stock_changes'))
     return out_schema.jsonify(new_product)
 
 
@@ -193,9 +242,9 @@ class ProductDetailAPI(MethodView):
     def get(self, product_id):
         """Get a single product."""
         product = Product.query.get_or_404(product_id)
-        schema = ProductSchema(exclude=('varieties.stock_changes',
-                                        'varieties.product',
-                                        'varieties.product_id'))
+        schema = get_schema(ProductSchema, exclude=('varieties.stock_changes',
+                                                    'varieties.product',
+                                                    'varieties.product_id'))
         return schema.jsonify(product)
 
     @admin_required
@@ -34,39 +34,55 @@ from sqlalchemy import or_
 from sqlalchemy.exc import IntegrityError
 
 from innopoints.blueprints import api
-from innopoints.core.helpers import abort, allow_no_json, admin_required
+from innopoints.core.fieldsets import loader_options, requested_fields
+from innopoints.core.helpers import abort, admin_required, allow_no_json, escape_like, LIKE_ESCAPE
 from innopoints.core.notifications import notify, notify_all, remove_notifications
+from innopoints.core.pagination import (
+    count_rows,
+    encode_cursor,
+    keyset_filter,
+    requested_count_mode,
+    requested_cursor,
+    requested_limit,
+)
+from innopoints.core.replica import replica_safe
+from innopoints.core.sql_rendering import render_projects, sql_rendering_enabled
+from innopoints.core.statistics import refresh_account_summary, refresh_project_summary
 from innopoints.extensions import db
 from innopoints.models import (
     Account,
     Activity,
-    activity_competence,
     Application,
     ApplicationStatus,
     LifetimeStage,
     NotificationType,
     Project,
+    ProjectSummary,
     ReviewStatus,
     Tag,
+    TimelineEvent,
+    TimelineEventType,
 )
-from innopoints.schemas import ProjectSchema, TagSchema
+from innopoints.schemas import get_schema, ProjectSchema, schema_context, TagSchema
 
 NO_PAYLOAD = ('', 204)
 log = logging.getLogger(__name__)
 
 
 @api.route('/projects')
+@replica_safe
 def list_ongoing_projects():
-    """List ongoing projects."""
-    first_activity = db.func.min(Activity.start_date)
-    competence_array = db.func.ARRAY_AGG(activity_competence.c.competence_id)
+    """List ongoing projects.
+
+    The filters and the proximity ordering use the summaries of the activities
+    kept in the ProjectSummary table."""
     default_order_by = 'creation_time'
     default_order = 'desc'
     ordering = {
         ('creation_time', 'asc'): Project.creation_time.asc(),
         ('creation_time', 'desc'): Project.creation_time.desc(),
-        ('proximity', 'asc'): first_activity.asc(),
-        ('proximity', 'desc'): first_activity.desc(),
+        ('proximity', 'asc'): ProjectSummary.first_start.asc(),
+        ('proximity', 'desc'): ProjectSummary.first_start.desc(),
     }
 
     try:
@@ -77,82 +93,50 @@ def list_ongoing_projects():
     except ValueError:
         abort(400, {'message': 'Bad query parameters.'})
 
-    db_query = Project.query.filter_by(lifetime_stage=LifetimeStage.ongoing)
+    db_query = (
+        # pylint: disable=bad-continuation
+        Project.query.filter_by(lifetime_stage=LifetimeStage.ongoing)
+            .join(ProjectSummary, ProjectSummary.project_id == Project.id)
+    )
 
-    # pylint: disable=bad-continuation
-    narrowed_activity = None
-    narrowed_subquery = None
     if spots > 0:
-        narrowed_activity = (
-            (narrowed_activity or Activity.query)
-                .outerjoin(Application, (Activity.id == Application.activity_id)
-                                      & (Application.status == ApplicationStatus.approved))
-                .add_column(
-                    db.func.greatest(
-                        Activity.people_required - db.func.count(Application.id), -1
-                    ).label('spots')
-                ).group_by(Activity)
-        )
-        narrowed_subquery = narrowed_activity.subquery()
-    if excluded_competences:
-        narrowed_activity = (
-            (narrowed_activity or Activity.query).join(activity_competence).group_by(Activity)
-                .having(~(competence_array.op('<@')(excluded_competences)))
-        )
-        narrowed_subquery = narrowed_activity.subquery()
+        db_query = db_query.filter(or_(ProjectSummary.vacant_spots >= spots,
+                                       ProjectSummary.vacant_spots.is_(None)))
 
-    if narrowed_subquery is not None:
-        db_query = db_query.join(narrowed_subquery, Project.id == narrowed_subquery.c.project_id)
-    else:
-        db_query = db_query.join(Activity)
-
-    if spots > 0:
-        db_query = db_query.filter((narrowed_subquery.c.spots >= spots)
-                                 | (narrowed_subquery.c.spots == -1)).group_by(Project)
+    if excluded_competences:
+        db_query = db_query.filter(~ProjectSummary.competences.op('<@')(excluded_competences))
 
     if 'q' in request.args:
-        like_query = f'%{request.args["q"]}%'
-        if narrowed_subquery is None:
-            db_query = db_query.filter(
-                or_(Project.name.ilike(like_query),
-                    Activity.name.ilike(like_query),
-                    Activity.description.ilike(like_query))
-            )
-        else:
-            db_query = db_query.filter(
-                or_(Project.name.ilike(like_query),
-                    narrowed_subquery.c.name.ilike(like_query),
-                    narrowed_subquery.c.description.ilike(like_query))
-            )
+        like_query = f'%{escape_like(request.args["q"])}%'
+        db_query = db_query.filter(ProjectSummary.search_text.ilike(like_query,
+                                                                    escape=LIKE_ESCAPE))
 
     if start_date:
-        if narrowed_subquery is None:
-            last_activity_start = db.func.max(Activity.start_date)
-        else:
-            last_activity_start = db.func.max(narrowed_subquery.c.start_date)
-        db_query = db_query.group_by(Project).having(last_activity_start >= start_date)
+        db_query = db_query.filter(ProjectSummary.last_start >= start_date)
 
     if end_date:
-        if narrowed_subquery is None:
-            first_activity_end = db.func.min(Activity.end_date)
-        else:
-            first_activity_end = db.func.min(narrowed_subquery.c.end_date)
-        db_query = db_query.group_by(Project).having(first_activity_end <= end_date)
+        db_query = db_query.filter(ProjectSummary.first_end <= end_date)
 
     order_by = request.args.get('order_by', default_order_by)
     order = request.args.get('order', default_order)
     if (order_by, order) not in ordering:
         abort(400, {'message': 'Invalid ordering specified.'})
 
-    if order_by == 'proximity':
-        db_query = db_query.group_by(Project.id)
     db_query = db_query.order_by(ordering[order_by, order])
 
+    fields = requested_fields(ProjectSchema)
+    db_query = db_query.options(*loader_options(Project, fields))
+
     conditional_exclude = ['review_status', 'moderators']
     if current_user.is_authenticated:
         conditional_exclude.remove('moderators')
         if current_user.is_admin:
             conditional_exclude.remove('review_status')
+
+    if fields is None and sql_rendering_enabled():
+        project_ids = dict.fromkeys(row[0] for row in db_query.with_entities(Project.id))
+        return render_projects(list(project_ids), exclude=conditional_exclude)
+
     exclude = ['admin_feedback', 'files', 'lifetime_stage']
     activity_exclude = [f'activities.{field}' for field in ('description', 'telegram_required',
                                                             'fixed_reward', 'working_hours',
@@ -160,13 +144,19 @@ def list_ongoing_projects():
                                                             'application_deadline', 'project',
                                                             'applications', 'existing_application',
                                                             'feedback_questions')]
-    schema = ProjectSchema(many=True, exclude=exclude + activity_exclude + conditional_exclude)
+    schema = get_schema(ProjectSchema, many=True, only=fields,
+                        exclude=exclude + activity_exclude + conditional_exclude)
     return schema.jsonify(db_query.all())
 
 
 @api.route('/projects/past')
+@replica_safe
 def list_past_projects():
-    """List past projects."""
+    """List past projects, newest first.
+
+    The pages are requested either by number or by the cursor from the previous page.
+    The total is counted exactly for the numbered pages and not at all for the cursor-based
+    ones, unless overridden with `count`."""
     default_page = 1
     default_limit = 12
 
@@ -180,18 +170,28 @@ def list_past_projects():
                 Activity.description.ilike(like_query))
         ).distinct()
 
+    limit = requested_limit(default_limit)
+    cursor = requested_cursor((datetime, int))
     try:
-        limit = int(request.args.get('limit', default_limit))
         page = int(request.args.get('page', default_page))
     except ValueError:
         abort(400, {'message': 'Bad query parameters.'})
 
-    if limit < 1 or page < 1:
+    if page < 1:
         abort(400, {'message': 'Limit and page number must be positive.'})
 
-    count = db.session.query(db_query.subquery()).count()
-    db_query = db_query.order_by(Project.creation_time.desc())
-    db_query = db_query.offset(limit * (page - 1)).limit(limit)
+    count = count_rows(db_query, requested_count_mode('none' if cursor is not None else 'exact'))
+    db_query = db_query.order_by(Project.creation_time.desc(), Project.id.desc())
+    if cursor is not None:
+        db_query = db_query.filter(
+            keyset_filter((Project.creation_time, Project.id), cursor, descending=True)
+        )
+    else:
+        db_query = db_query.offset(limit * (page - 1))
+    db_query = db_query.limit(limit + 1)
+
+    fields = requested_fields(ProjectSchema)
+    db_query = db_query.options(*loader_options(Project, fields))
 
     conditional_exclude = ['review_status', 'moderators']
     if current_user.is_authenticated:
@@ -205,9 +205,18 @@ def list_past_projects():
                                                             'application_deadline', 'project',
                                                             'applications', 'existing_application',
                                                             'feedback_questions')]
-    schema = ProjectSchema(many=True, exclude=exclude + activity_exclude + conditional_exclude)
-    return jsonify(pages=math.ceil(count / limit),
-                   data=schema.dump(db_query.all()))
+    schema = get_schema(ProjectSchema, many=True, only=fields,
+                        exclude=exclude + activity_exclude + conditional_exclude)
+
+    projects = db_query.all()
+    next_cursor = None
+    if len(projects) > limit:
+        projects = projects[:limit]
+        next_cursor = encode_cursor(projects[-1].creation_time, projects[-1].id)
+
+    return jsonify(pages=None if count is None else math.ceil(count / limit),
+                   data=schema.dump(projects),
+                   next_cursor=next_cursor)
 
 
 @api.route('/projects/drafts')
@@ -216,7 +225,7 @@ def list_drafts():
     """Return a list of drafts for the logged in user."""
     db_query = Project.query.filter_by(lifetime_stage=LifetimeStage.draft,
                                        creator=current_user).order_by(Project.creation_time.desc())
-    schema = ProjectSchema(many=True, only=('id', 'name', 'creation_time'))
+    schema = get_schema(ProjectSchema, many=True, only=('id', 'name', 'creation_time'))
     return schema.jsonify(db_query.all())
 
 
@@ -225,7 +234,7 @@ def list_drafts():
 def list_projects_for_review():
     """Return a list of projects pending the administrator's review."""
     db_query = Project.query.filter_by(review_status=ReviewStatus.pending)
-    schema = ProjectSchema(many=True, only=('id', 'name', 'creator'))
+    schema = get_schema(ProjectSchema, many=True, only=('id', 'name', 'creator'))
     return schema.jsonify(db_query.all())
 
 
@@ -256,16 +265,18 @@ def create_project():
     db.session.add(new_project)
 
     try:
+        db.session.flush()
+        refresh_project_summary(new_project.id)
         db.session.commit()
     except IntegrityError as err:
         db.session.rollback()
         log.exception(err)
         abort(400, {'message': 'Data integrity violated.'})
 
-    out_schema = ProjectSchema(exclude=('admin_feedback', 'review_status', 'files',
-                                        'activities.existing_application'),
-                               context={'user': current_user})
-    return out_schema.jsonify(new_project)
+    out_schema = get_schema(ProjectSchema, exclude=('admin_feedback', 'review_status', 'files',
+                                                    'activities.existing_application'))
+    with schema_context(user=current_user):
+        return out_schema.jsonify(new_project)
 
 
 @allow_no_json
@@ -293,9 +304,17 @@ def publish_project(project_id):
         abort(400, {'message': 'The activities must have from 1 to 3 competences.'})
 
     project.lifetime_stage = LifetimeStage.ongoing
+    moderators = [moderator for moderator in project.moderators if moderator != project.creator]
+    db.session.add(TimelineEvent(type=TimelineEventType.project,
+                                 account_email=project.creator_email,
+                                 entry_time=project.creation_time,
+                                 project=project))
+    db.session.add_all(TimelineEvent(type=TimelineEventType.promotion,
+                                     account_email=moderator.email,
+                                     project=project)
+                       for moderator in moderators)
     db.session.commit()
 
-    moderators = filter(lambda moderator: moderator != project.creator, project.moderators)
     notify_all(moderators, NotificationType.added_as_moderator, {
         'project_id': project.id,
         'account_email': current_user.email,
@@ -404,6 +423,10 @@ def review_project(project_id):
         project.admin_feedback = request.json['admin_feedback']
 
     try:
+        if project.lifetime_stage == LifetimeStage.finished:
+            refresh_account_summary(*(application.applicant_email
+                                      for activity in project.activities
+                                      for application in activity.applications))
         db.session.commit()
     except IntegrityError as err:
         db.session.rollback()
@@ -478,8 +501,9 @@ class ProjectDetailAPI(MethodView):
                 if current_user == project.creator or current_user.is_admin:
                     exclude.remove('admin_feedback')
 
-        schema = ProjectSchema(exclude=exclude, context={'user': current_user})
-        return schema.jsonify(project)
+        schema = get_schema(ProjectSchema, exclude=exclude)
+        with schema_context(user=current_user):
+            return schema.jsonify(project)
 
     @login_required
     def patch(self, project_id):
@@ -505,13 +529,15 @@ class ProjectDetailAPI(MethodView):
 
         try:
             db.session.add(updated_project)
+            if 'name' in request.json:
+                refresh_project_summary(project_id)
             db.session.commit()
         except IntegrityError as err:
             db.session.rollback()
             log.exception(err)
             abort(400, {'message': 'Data integrity violated.'})
 
-        out_schema = ProjectSchema(only=('id', 'name', 'image_id', 'moderators'))
+        out_schema = get_schema(ProjectSchema, only=('id', 'name', 'image_id', 'moderators'))
         return out_schema.jsonify(updated_project)
 
     @login_required
@@ -523,8 +549,12 @@ class ProjectDetailAPI(MethodView):
         if project.lifetime_stage == LifetimeStage.finished:
             abort(400, {'message': 'Cannot delete a finished project'})
 
+        applicants = [application.applicant_email
+                      for activity in project.activities
+                      for application in activity.applications]
         try:
             db.session.delete(project)
+            refresh_account_summary(*applicants)
             db.session.commit()
         except IntegrityError as err:
             db.session.rollback()
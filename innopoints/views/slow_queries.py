@@ -0,0 +1,20 @@
+"""Views for browsing the slow query log.
+
+- GET /admin/slow_queries
+"""
+
+from flask import jsonify
+
+from innopoints.blueprints import api
+from innopoints.core.helpers import admin_required
+from innopoints.core.slow_queries import recorded_queries
+
+
+@api.route('/admin/slow_queries')
+@admin_required
+def list_slow_queries():
+    """List the slow queries recorded by the worker process serving the request, newest first.
+
+    Every worker keeps its own log, so the list differs between the requests
+    when several workers are running."""
+    return jsonify(recorded_queries())
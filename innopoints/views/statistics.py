@@ -11,6 +11,8 @@ from flask import jsonify, request
 
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort, admin_required
+from innopoints.core.replica import replica_safe
+from innopoints.core.timeouts import statement_timeout
 from innopoints.core.timezone import tz_aware_now, unix_epoch
 from innopoints.extensions import db
 from innopoints.models import (
@@ -27,9 +29,14 @@ from innopoints.models import (
     project_tags,
 )
 
+# The statistics scan large parts of the history, don't let them hog a connection
+STATISTICS_TIMEOUT = 15_000  # ms
+
 
 @api.route('/statistics/competences')
 @admin_required
+@replica_safe
+@statement_timeout(STATISTICS_TIMEOUT)
 def get_competence_stats():
     """Return the statistics on the developed competences."""
     if 'start_date' in request.args:
@@ -85,6 +92,8 @@ def get_competence_stats():
 
 @api.route('/statistics/hours')
 @admin_required
+@replica_safe
+@statement_timeout(STATISTICS_TIMEOUT)
 def get_hour_stats():
     """Return the statistics on the volunteering hours."""
     if 'start_date' in request.args:
@@ -136,6 +145,8 @@ def get_hour_stats():
 
 @api.route('/statistics/innopoints')
 @admin_required
+@replica_safe
+@statement_timeout(STATISTICS_TIMEOUT)
 def get_innopoint_stats():
     """Return the statistics on the amount of innopoints spent."""
     if 'start_date' in request.args:
@@ -20,6 +20,7 @@ Color:
 - POST /colors
 """
 
+from datetime import datetime
 import math
 import logging
 
@@ -33,6 +34,14 @@ from innopoints.extensions import db
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort, admin_required
 from innopoints.core.notifications import notify_all, notify, remove_notifications
+from innopoints.core.pagination import (
+    count_rows,
+    encode_cursor,
+    keyset_filter,
+    requested_count_mode,
+    requested_cursor,
+    requested_limit,
+)
 from innopoints.models import (
     Account,
     Color,
@@ -41,11 +50,14 @@ from innopoints.models import (
     Size,
     StockChange,
     StockChangeStatus,
+    TimelineEvent,
+    TimelineEventType,
     Transaction,
     Variety,
 )
 from innopoints.schemas import (
     ColorSchema,
+    get_schema,
     SizeSchema,
     StockChangeSchema,
     VarietySchema,
@@ -117,6 +129,10 @@ class VarietyAPI(MethodView):
                                            account=current_user,
                                            variety_id=updated_variety.id)
                 db.session.add(stock_change)
+                if diff < 0:
+                    db.session.add(TimelineEvent(type=TimelineEventType.purchase,
+                                                 account_email=current_user.email,
+                                                 stock_change=stock_change))
 
         try:
             db.session.add(updated_variety)
@@ -175,9 +191,10 @@ def purchase_variety(product_id, variety_id):
     if variety.product != product:
         abort(400, {'message': 'The specified product and variety are unrelated.'})
 
-    log.debug(f'User with balance {current_user.balance} is trying to buy {purchased_amount} of a '
-              f'product with a price of {product.price}. '
-              f'Total = {product.price * purchased_amount}')
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('User with balance %d is trying to buy %d of a product with a price of %d. '
+                  'Total = %d', current_user.balance, purchased_amount, product.price,
+                  product.price * purchased_amount)
     if current_user.balance < product.price * purchased_amount:
         log.debug('Purchase refused: not enough points')
         abort(400, {'message': 'Insufficient funds.'})
@@ -191,6 +208,9 @@ def purchase_variety(product_id, variety_id):
                                    account=current_user,
                                    variety_id=variety_id)
     db.session.add(new_stock_change)
+    db.session.add(TimelineEvent(type=TimelineEventType.purchase,
+                                 account_email=current_user.email,
+                                 stock_change=new_stock_change))
     new_transaction = Transaction(account=current_user,
                                   change=-product.price * purchased_amount,
                                   stock_change_id=new_stock_change)
@@ -218,8 +238,8 @@ def purchase_variety(product_id, variety_id):
             'variety_id': variety.id,
         })
 
-    out_schema = StockChangeSchema(exclude=('transaction', 'account', 'account_email',
-                                            'product', 'variety'))
+    out_schema = get_schema(StockChangeSchema, exclude=('transaction', 'account', 'account_email',
+                                                        'product', 'variety'))
     return out_schema.jsonify(new_stock_change)
 
 
@@ -228,32 +248,42 @@ def purchase_variety(product_id, variety_id):
 @api.route('/stock_changes')
 @admin_required
 def list_purchases():
-    """List all of the purchases."""
+    """List all of the purchases, newest first.
+
+    The pages are requested either by number or by the cursor from the previous page."""
     default_limit = 24
     default_page = 1
 
+    limit = requested_limit(default_limit)
+    cursor = requested_cursor((datetime, int))
     try:
-        limit = int(request.args.get('limit', default_limit))
         page = int(request.args.get('page', default_page))
     except ValueError:
         abort(400, {'message': 'Bad query parameters.'})
 
-    if limit < 1 or page < 1:
+    if page < 1:
         abort(400, {'message': 'Limit and page number must be positive.'})
 
     purchases = StockChange.query.filter(StockChange.amount < 0)
-    count = db.session.query(purchases.subquery()).count()
-    purchases = (
-        # pylint: disable=bad-continuation
-        purchases
-            .order_by(StockChange.time.desc())
-            .offset(limit * (page - 1))
-            .limit(limit)
-    )
-
-    schema = StockChangeSchema(many=True)
-    return jsonify(pages=math.ceil(count / limit),
-                   data=schema.dump(purchases.all()))
+    count = count_rows(purchases, requested_count_mode('none' if cursor is not None else 'exact'))
+    purchases = purchases.order_by(StockChange.time.desc(), StockChange.id.desc())
+    if cursor is not None:
+        purchases = purchases.filter(
+            keyset_filter((StockChange.time, StockChange.id), cursor, descending=True)
+        )
+    else:
+        purchases = purchases.offset(limit * (page - 1))
+
+    purchases = purchases.limit(limit + 1).all()
+    next_cursor = None
+    if len(purchases) > limit:
+        purchases = purchases[:limit]
+        next_cursor = encode_cursor(purchases[-1].time, purchases[-1].id)
+
+    schema = get_schema(StockChangeSchema, many=True)
+    return jsonify(pages=None if count is None else math.ceil(count / limit),
+                   data=schema.dump(purchases),
+                   next_cursor=next_cursor)
 
 
 @api.route('/stock_changes/for_review')
@@ -263,8 +293,9 @@ def get_purchases_for_review():
     db_query = StockChange.query.filter(
         StockChange.status.in_((StockChangeStatus.pending, StockChangeStatus.ready_for_pickup))
     )
-    schema = StockChangeSchema(many=True, exclude=('transaction', 'variety.product_id',
-                                                   'variety.product'))
+    schema = get_schema(StockChangeSchema, many=True, exclude=('transaction',
+                                                               'variety.product_id',
+                                                               'variety.product'))
     return schema.jsonify(db_query.all())
 
 
@@ -0,0 +1,56 @@
+"""Add transaction times and balance checkpoints
+
+Revision ID: 0d6b2f8e5a93
+Revises: f4a9c3e7b1d6
+Create Date: 2026-10-19 21:34:41.187352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d6b2f8e5a93'
+down_revision = 'f4a9c3e7b1d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('transactions', sa.Column('time', sa.DateTime(timezone=True), nullable=True))
+
+    # Take the time from the purchase, the feedback or the notification about the manual change.
+    # The time of a transaction that can't be traced is unknown, so it's placed at the epoch
+    # to count towards the balance at any moment.
+    op.execute('''
+        UPDATE transactions
+        SET time = coalesce(
+            (SELECT stock_changes.time
+             FROM stock_changes
+             WHERE stock_changes.id = transactions.stock_change_id),
+            (SELECT feedback.time
+             FROM feedback
+             WHERE feedback.application_id = transactions.feedback_id),
+            (SELECT min(notifications.timestamp)
+             FROM notifications
+             WHERE notifications.type = 'manual_transaction'
+               AND (notifications.payload ->> 'transaction_id')::integer = transactions.id),
+            to_timestamp(0)
+        )
+    ''')
+    op.alter_column('transactions', 'time', nullable=False)
+    op.create_index('transactions_account_time', 'transactions', ['account_email', 'time'])
+
+    op.create_table('balance_checkpoints',
+    sa.Column('account_email', sa.String(length=128), nullable=False),
+    sa.Column('time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('balance', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['account_email'], ['accounts.email'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('account_email', 'time')
+    )
+
+
+def downgrade():
+    op.drop_table('balance_checkpoints')
+    op.drop_index('transactions_account_time', 'transactions')
+    op.drop_column('transactions', 'time')
@@ -0,0 +1,32 @@
+"""Add keyset pagination indexes
+
+Revision ID: 2c8e4a1f7b35
+Revises: 0d6b2f8e5a93
+Create Date: 2026-10-19 22:15:03.558921
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8e4a1f7b35'
+down_revision = '0d6b2f8e5a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('projects_past_keyset', 'projects', ['creation_time', 'id'],
+                    postgresql_where=sa.text("lifetime_stage IN ('finalizing', 'finished')"))
+    op.create_index('products_addition_time_keyset', 'products', ['addition_time', 'id'])
+    op.create_index('products_price_keyset', 'products', ['price', 'id'])
+    op.create_index('stock_changes_purchases_keyset', 'stock_changes', ['time', 'id'],
+                    postgresql_where=sa.text('amount < 0'))
+
+
+def downgrade():
+    op.drop_index('stock_changes_purchases_keyset', 'stock_changes')
+    op.drop_index('products_price_keyset', 'products')
+    op.drop_index('products_addition_time_keyset', 'products')
+    op.drop_index('projects_past_keyset', 'projects')
@@ -0,0 +1,74 @@
+"""Add timeline events
+
+Revision ID: 3b6f0a9d2c41
+Revises: 5a4cf17483a5
+Create Date: 2026-10-19 16:05:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b6f0a9d2c41'
+down_revision = '5a4cf17483a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('timeline_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_email', sa.String(length=128), nullable=False),
+    sa.Column('entry_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('type', sa.Enum('application', 'purchase', 'promotion', 'project', name='timelineeventtype'), nullable=False),
+    sa.Column('application_id', sa.Integer(), nullable=True),
+    sa.Column('stock_change_id', sa.Integer(), nullable=True),
+    sa.Column('project_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['account_email'], ['accounts.email'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['application_id'], ['applications.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['stock_change_id'], ['stock_changes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Backfill the events that the timeline used to collect on every request
+    op.execute('''
+        INSERT INTO timeline_events (account_email, entry_time, type, application_id, project_id)
+        SELECT applications.applicant_email, applications.application_time, 'application',
+               applications.id, activities.project_id
+        FROM applications
+        JOIN activities ON activities.id = applications.activity_id
+        WHERE NOT activities.internal
+    ''')
+    op.execute('''
+        INSERT INTO timeline_events (account_email, entry_time, type, stock_change_id)
+        SELECT stock_changes.account_email, stock_changes.time, 'purchase', stock_changes.id
+        FROM stock_changes
+        JOIN varieties ON varieties.id = stock_changes.variety_id
+        WHERE stock_changes.amount < 0
+    ''')
+    op.execute('''
+        INSERT INTO timeline_events (account_email, entry_time, type, project_id)
+        SELECT notifications.recipient_email, notifications.timestamp, 'promotion', projects.id
+        FROM notifications
+        JOIN projects ON projects.id = (notifications.payload ->> 'project_id')::integer
+        WHERE notifications.type = 'added_as_moderator'
+          AND projects.creator_email != notifications.recipient_email
+          AND projects.lifetime_stage != 'draft'
+    ''')
+    op.execute('''
+        INSERT INTO timeline_events (account_email, entry_time, type, project_id)
+        SELECT projects.creator_email, projects.creation_time, 'project', projects.id
+        FROM projects
+        WHERE projects.lifetime_stage != 'draft'
+    ''')
+
+    op.create_index('timeline_events_keyset', 'timeline_events',
+                    ['account_email', sa.text('entry_time DESC'), sa.text('id DESC')])
+
+
+def downgrade():
+    op.drop_index('timeline_events_keyset', 'timeline_events')
+    op.drop_table('timeline_events')
+    sa.Enum(name='timelineeventtype').drop(op.get_bind())
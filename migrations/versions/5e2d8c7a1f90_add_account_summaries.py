@@ -0,0 +1,83 @@
+"""Add account summaries
+
+Revision ID: 5e2d8c7a1f90
+Revises: 3b6f0a9d2c41
+Create Date: 2026-10-19 18:21:47.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2d8c7a1f90'
+down_revision = '3b6f0a9d2c41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('account_summaries',
+    sa.Column('account_email', sa.String(length=128), nullable=False),
+    sa.Column('hours', sa.Integer(), nullable=False),
+    sa.Column('positions', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('competences', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.ForeignKeyConstraint(['account_email'], ['accounts.email'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('account_email')
+    )
+
+    # Backfill the summaries of the existing accounts
+    op.execute('''
+        INSERT INTO account_summaries (account_email, hours, positions,
+                                       rating_sum, rating_count, competences)
+        SELECT accounts.email,
+               coalesce(volunteering.hours, 0),
+               coalesce(volunteering.positions, 0),
+               coalesce(rating.rating_sum, 0),
+               coalesce(rating.rating_count, 0),
+               coalesce(histogram.competences, '{}'::jsonb)
+        FROM accounts
+        LEFT JOIN (
+            SELECT applications.applicant_email,
+                   sum(applications.actual_hours) AS hours,
+                   count(applications.id) AS positions
+            FROM applications
+            JOIN activities ON activities.id = applications.activity_id
+            JOIN projects ON projects.id = activities.project_id
+            WHERE applications.status = 'approved'
+              AND NOT activities.fixed_reward
+              AND NOT activities.internal
+              AND projects.lifetime_stage = 'finished'
+            GROUP BY applications.applicant_email
+        ) AS volunteering ON volunteering.applicant_email = accounts.email
+        LEFT JOIN (
+            SELECT applications.applicant_email,
+                   sum(reports.rating) AS rating_sum,
+                   count(reports.rating) AS rating_count
+            FROM reports
+            JOIN applications ON applications.id = reports.application_id
+            WHERE applications.status = 'approved'
+            GROUP BY applications.applicant_email
+        ) AS rating ON rating.applicant_email = accounts.email
+        LEFT JOIN (
+            SELECT competence_counts.applicant_email,
+                   jsonb_object_agg(competence_counts.competence_id,
+                                    competence_counts.amount) AS competences
+            FROM (
+                SELECT applications.applicant_email,
+                       feedback_competence.competence_id,
+                       count(*) AS amount
+                FROM feedback_competence
+                JOIN applications ON applications.id = feedback_competence.feedback_id
+                GROUP BY applications.applicant_email, feedback_competence.competence_id
+            ) AS competence_counts
+            GROUP BY competence_counts.applicant_email
+        ) AS histogram ON histogram.applicant_email = accounts.email
+    ''')
+
+
+def downgrade():
+    op.drop_table('account_summaries')
@@ -0,0 +1,28 @@
+"""Add trigram indexes on accounts
+
+Revision ID: 8a4c1e6b7d52
+Revises: 5e2d8c7a1f90
+Create Date: 2026-10-19 19:02:33.614870
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4c1e6b7d52'
+down_revision = '5e2d8c7a1f90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('accounts_email_trgm', 'accounts', ['email'],
+                    postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+    op.create_index('accounts_full_name_trgm', 'accounts', ['full_name'],
+                    postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('accounts_full_name_trgm', 'accounts')
+    op.drop_index('accounts_email_trgm', 'accounts')
@@ -0,0 +1,86 @@
+"""Add project summaries
+
+Revision ID: 9e7d3b5a1c84
+Revises: 2c8e4a1f7b35
+Create Date: 2026-10-19 23:02:36.184507
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e7d3b5a1c84'
+down_revision = '2c8e4a1f7b35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('project_summaries',
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('first_start', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_start', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('first_end', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('vacant_spots', sa.Integer(), nullable=True),
+    sa.Column('competences', sa.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('search_text', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('project_id')
+    )
+
+    # Backfill the summaries of the existing projects
+    op.execute(r'''
+        INSERT INTO project_summaries (project_id, first_start, last_start, first_end,
+                                       vacant_spots, competences, search_text)
+        SELECT projects.id,
+               min(activities.start_date),
+               max(activities.start_date),
+               min(activities.end_date),
+               CASE WHEN count(activities.id) = 0 THEN 0
+                    WHEN bool_or(activities.people_required IS NULL) THEN NULL
+                    ELSE max(activities.people_required - coalesce(accepted.amount, 0))
+               END,
+               coalesce(project_competences.competences, '{}'),
+               concat_ws(E'\n', projects.name,
+                         string_agg(concat_ws(E'\n', activities.name, activities.description),
+                                    E'\n'))
+        FROM projects
+        LEFT JOIN activities ON activities.project_id = projects.id
+                             AND NOT activities.internal
+        LEFT JOIN (
+            SELECT applications.activity_id, count(*) AS amount
+            FROM applications
+            WHERE applications.status = 'approved'
+            GROUP BY applications.activity_id
+        ) AS accepted ON accepted.activity_id = activities.id
+        LEFT JOIN (
+            SELECT activities.project_id,
+                   array_agg(DISTINCT activity_competence.competence_id) AS competences
+            FROM activity_competence
+            JOIN activities ON activities.id = activity_competence.activity_id
+            WHERE NOT activities.internal
+            GROUP BY activities.project_id
+        ) AS project_competences ON project_competences.project_id = projects.id
+        GROUP BY projects.id, project_competences.competences
+    ''')
+
+    op.create_index(op.f('ix_project_summaries_first_start'), 'project_summaries',
+                    ['first_start'], unique=False)
+    op.create_index(op.f('ix_project_summaries_last_start'), 'project_summaries',
+                    ['last_start'], unique=False)
+    op.create_index(op.f('ix_project_summaries_first_end'), 'project_summaries',
+                    ['first_end'], unique=False)
+    op.create_index(op.f('ix_project_summaries_vacant_spots'), 'project_summaries',
+                    ['vacant_spots'], unique=False)
+    op.create_index('project_summaries_search_text_trgm', 'project_summaries', ['search_text'],
+                    postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('project_summaries_search_text_trgm', 'project_summaries')
+    op.drop_index(op.f('ix_project_summaries_vacant_spots'), table_name='project_summaries')
+    op.drop_index(op.f('ix_project_summaries_first_end'), table_name='project_summaries')
+    op.drop_index(op.f('ix_project_summaries_last_start'), table_name='project_summaries')
+    op.drop_index(op.f('ix_project_summaries_first_start'), table_name='project_summaries')
+    op.drop_table('project_summaries')
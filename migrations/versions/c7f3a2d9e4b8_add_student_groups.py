@@ -0,0 +1,39 @@
+"""Add student groups
+
+Revision ID: c7f3a2d9e4b8
+Revises: 8a4c1e6b7d52
+Create Date: 2026-10-19 19:40:08.251937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f3a2d9e4b8'
+down_revision = '8a4c1e6b7d52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('student_groups',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('member_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_index(op.f('ix_accounts_group'), 'accounts', ['group'], unique=False)
+
+    op.execute('''
+        INSERT INTO student_groups (name, member_count)
+        SELECT accounts.group, count(*)
+        FROM accounts
+        WHERE NOT accounts.is_admin
+          AND accounts.group SIMILAR TO '[BM][0-9]+(-[A-Z]+)?-[0-9]+'
+        GROUP BY accounts.group
+    ''')
+
+
+def downgrade():
+    op.drop_index(op.f('ix_accounts_group'), table_name='accounts')
+    op.drop_table('student_groups')
@@ -0,0 +1,35 @@
+"""Add legacy accounts
+
+Revision ID: e1b5d8f3a6c2
+Revises: c7f3a2d9e4b8
+Create Date: 2026-10-19 20:12:55.730416
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b5d8f3a6c2'
+down_revision = 'c7f3a2d9e4b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('legacy_accounts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=128), nullable=True),
+    sa.Column('username', sa.String(length=128), nullable=True),
+    sa.Column('password', sa.String(length=256), nullable=False),
+    sa.Column('points', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_legacy_accounts_email'), 'legacy_accounts', ['email'], unique=False)
+    op.create_index(op.f('ix_legacy_accounts_username'), 'legacy_accounts', ['username'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_legacy_accounts_username'), table_name='legacy_accounts')
+    op.drop_index(op.f('ix_legacy_accounts_email'), table_name='legacy_accounts')
+    op.drop_table('legacy_accounts')
@@ -0,0 +1,72 @@
+"""Move push subscriptions to a table
+
+Revision ID: f4a9c3e7b1d6
+Revises: e1b5d8f3a6c2
+Create Date: 2026-10-19 20:48:19.064127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a9c3e7b1d6'
+down_revision = 'e1b5d8f3a6c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('push_subscriptions',
+    sa.Column('endpoint', sa.Text(), nullable=False),
+    sa.Column('account_email', sa.String(length=128), nullable=False),
+    sa.Column('p256dh', sa.String(length=128), nullable=False),
+    sa.Column('auth', sa.String(length=64), nullable=False),
+    sa.ForeignKeyConstraint(['account_email'], ['accounts.email'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('endpoint')
+    )
+    op.create_index(op.f('ix_push_subscriptions_account_email'), 'push_subscriptions',
+                    ['account_email'], unique=False)
+
+    # The last subscription of a repeated endpoint wins, like it would with an upsert
+    op.execute('''
+        INSERT INTO push_subscriptions (endpoint, account_email, p256dh, auth)
+        SELECT DISTINCT ON (subscription.value ->> 'endpoint')
+               subscription.value ->> 'endpoint',
+               accounts.email,
+               subscription.value -> 'keys' ->> 'p256dh',
+               subscription.value -> 'keys' ->> 'auth'
+        FROM accounts,
+             jsonb_array_elements(accounts.notification_settings -> 'subscriptions')
+                 WITH ORDINALITY AS subscription (value, position)
+        WHERE jsonb_typeof(accounts.notification_settings -> 'subscriptions') = 'array'
+          AND subscription.value ->> 'endpoint' IS NOT NULL
+          AND subscription.value -> 'keys' ->> 'p256dh' IS NOT NULL
+          AND subscription.value -> 'keys' ->> 'auth' IS NOT NULL
+        ORDER BY subscription.value ->> 'endpoint', subscription.position DESC
+    ''')
+    op.execute('''
+        UPDATE accounts
+        SET notification_settings = notification_settings - 'subscriptions'
+        WHERE notification_settings ? 'subscriptions'
+    ''')
+
+
+def downgrade():
+    op.execute('''
+        UPDATE accounts
+        SET notification_settings = jsonb_set(accounts.notification_settings, '{subscriptions}',
+                                              subscriptions.list)
+        FROM (
+            SELECT account_email,
+                   jsonb_agg(jsonb_build_object(
+                       'endpoint', endpoint,
+                       'keys', jsonb_build_object('p256dh', p256dh, 'auth', auth)
+                   )) AS list
+            FROM push_subscriptions
+            GROUP BY account_email
+        ) AS subscriptions
+        WHERE subscriptions.account_email = accounts.email
+    ''')
+    op.drop_index(op.f('ix_push_subscriptions_account_email'), table_name='push_subscriptions')
+    op.drop_table('push_subscriptions')
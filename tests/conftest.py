@@ -0,0 +1,82 @@
+"""Fixtures running the tests against a PostgreSQL database.
+
+The migrations are applied to the empty database passed as TEST_DATABASE_URL
+and its schema is dropped afterwards. The tests are skipped without it."""
+
+import os
+
+from flask_migrate import upgrade
+import pytest
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+CSRF_TOKEN = 'test-token'
+os.environ['DATABASE_URL'] = TEST_DATABASE_URL or 'postgresql://localhost/innopoints_test'
+os.environ.setdefault('MAIL_PASSWORD', '')
+
+# pylint: disable=wrong-import-position, redefined-outer-name
+from innopoints.app import create_app
+from innopoints.core.replica import REPLICA_BIND
+from innopoints.extensions import db
+
+
+def empty_tables():
+    """Delete the rows of all the tables."""
+    for table in reversed(db.metadata.sorted_tables):
+        db.session.execute(table.delete())
+    db.session.commit()
+
+
+@pytest.fixture(scope='session')
+def app():
+    """Create the application and migrate the test database."""
+    if TEST_DATABASE_URL is None:
+        pytest.skip('TEST_DATABASE_URL is not set.')
+
+    app = create_app('config/dev.py')
+    # The tables are emptied without the ORM events that keep the cached users up to date
+    app.config['USER_CACHE_TTL'] = 0
+    with app.app_context():
+        upgrade()
+        # Drop the initial data of the migrations, the tests make their own
+        empty_tables()
+        yield app
+        db.session.remove()
+        db.session.execute('DROP SCHEMA public CASCADE')
+        db.session.execute('CREATE SCHEMA public')
+        db.session.commit()
+
+
+@pytest.fixture
+def session(app):
+    """Provide the database session in an application context of its own,
+    so `g` isn't shared between the tests, and empty all the tables after the test."""
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        empty_tables()
+
+
+@pytest.fixture
+def client(app, session):  # pylint: disable=unused-argument
+    """Provide a test client that passes the CSRF check."""
+    client = app.test_client()
+    client.environ_base['HTTP_X_CSRF_TOKEN'] = CSRF_TOKEN
+    with client.session_transaction() as client_session:
+        client_session['csrf_token'] = CSRF_TOKEN
+    return client
+
+
+@pytest.fixture
+def replica(app):
+    """Configure the test database as the replica too, through a separate engine."""
+    app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: TEST_DATABASE_URL}
+    yield db.get_engine(app, bind=REPLICA_BIND)
+    db.get_engine(app, bind=REPLICA_BIND).dispose()
+    app.config['SQLALCHEMY_BINDS'] = None
+
+
+def log_in(client, account):
+    """Make the following requests of the client on behalf of the account."""
+    with client.session_transaction() as client_session:
+        client_session['_user_id'] = account.email
+        client_session['_fresh'] = True
@@ -0,0 +1,82 @@
+"""Tests of the pagination of the account list."""
+
+import pytest
+
+from innopoints.core.pagination import MAX_LIMIT
+from innopoints.models import Account
+
+from .conftest import log_in
+
+ACCOUNT_COUNT = 105
+
+
+@pytest.fixture
+def accounts(session, client):
+    """Create the accounts to list and log the client in as the first of them."""
+    accounts = [Account(email=f'student{number:03}@innopolis.university',
+                        full_name=f'Student {number}', is_admin=False)
+                for number in range(ACCOUNT_COUNT)]
+    session.add_all(accounts)
+    session.commit()
+    log_in(client, accounts[0])
+    return accounts
+
+
+def test_limit_clamped(client, accounts):
+    """A limit above the maximum is lowered to it rather than rejected."""
+    # pylint: disable=unused-argument
+    response = client.get(f'/api/v1/accounts?limit={MAX_LIMIT * 10}')
+    assert response.status_code == 200
+    page = response.get_json()
+    assert len(page['data']) == MAX_LIMIT
+    assert page['pages'] == 2
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'ten'])
+def test_invalid_limit(client, accounts, limit):
+    """A limit that isn't a positive integer is a bad request."""
+    # pylint: disable=unused-argument
+    assert client.get(f'/api/v1/accounts?limit={limit}').status_code == 400
+
+
+def test_count_modes(client, accounts):
+    """The numbered pages are counted exactly unless told otherwise."""
+    # pylint: disable=unused-argument
+    assert client.get('/api/v1/accounts?limit=10').get_json()['pages'] == 11
+    assert client.get('/api/v1/accounts?limit=10&count=none').get_json()['pages'] is None
+    assert isinstance(client.get('/api/v1/accounts?limit=10&count=estimate')
+                      .get_json()['pages'], int)
+    assert client.get('/api/v1/accounts?count=all').status_code == 400
+
+
+def test_cursor_round_trip(client, accounts):
+    """Following the cursors yields every account once, in the order of the e-mails."""
+    pages = []
+    url = '/api/v1/accounts?limit=10'
+    while True:
+        page = client.get(url).get_json()
+        pages.append(page)
+        if page['next_cursor'] is None:
+            break
+        url = f'/api/v1/accounts?limit=10&cursor={page["next_cursor"]}'
+
+    assert [len(page['data']) for page in pages] == [10] * 10 + [5]
+    # The total is only counted for the first page, which has no cursor
+    assert pages[0]['pages'] == 11
+    assert all(page['pages'] is None for page in pages[1:])
+    emails = [account['email'] for page in pages for account in page['data']]
+    assert emails == sorted(account.email for account in accounts)
+
+
+def test_invalid_cursor(client, accounts):
+    """A cursor that can't be decoded is a bad request."""
+    # pylint: disable=unused-argument
+    assert client.get('/api/v1/accounts?cursor=garbage').status_code == 400
+
+
+def test_search_escapes_wildcards(client, accounts):
+    """The wildcards in the query are matched literally."""
+    # pylint: disable=unused-argument
+    assert client.get('/api/v1/accounts?q=%25').get_json()['data'] == []
+    page = client.get('/api/v1/accounts?q=student00').get_json()
+    assert len(page['data']) == 10
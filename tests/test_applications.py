@@ -0,0 +1,104 @@
+"""Tests of the summaries kept up to date as the applications change."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from innopoints.core.statistics import refresh_account_summary, refresh_project_summary
+from innopoints.models import (
+    Account,
+    AccountSummary,
+    Activity,
+    Application,
+    ApplicationStatus,
+    LifetimeStage,
+    Project,
+    ProjectSummary,
+    VolunteeringReport,
+)
+
+from .conftest import log_in
+
+
+@pytest.fixture
+def application(session):
+    """Create an ongoing project with an activity for three people
+    and a pending application for it, with the summaries up to date."""
+    creator = Account(email='creator@innopolis.university', full_name='Creator', is_admin=False)
+    student = Account(email='student@innopolis.university', full_name='Student', is_admin=False)
+    project = Project(name='Open Day', creator=creator, moderators=[creator],
+                      lifetime_stage=LifetimeStage.ongoing)
+    activity = Activity(name='Guide', description='Show the campus to 100% of the guests',
+                        project=project, draft=False, working_hours=4, people_required=3,
+                        start_date=datetime(2020, 9, 1, 10, 0, tzinfo=timezone.utc),
+                        end_date=datetime(2020, 9, 1, 14, 0, tzinfo=timezone.utc))
+    session.add_all([creator, student, project, activity])
+    session.flush()
+    application = Application(applicant=student, activity=activity, actual_hours=4)
+    session.add(application)
+    refresh_account_summary(student.email)
+    refresh_project_summary(project.id)
+    session.commit()
+    return application
+
+
+def application_url(application):
+    """Return the URL of the applications for the activity of the application."""
+    return (f'/api/v1/projects/{application.activity.project_id}'
+            f'/activities/{application.activity_id}/applications')
+
+
+def vacant_spots(session, application):
+    """Return the vacant spots in the summary of the project of the application."""
+    session.expire_all()
+    return ProjectSummary.query.get(application.activity.project_id).vacant_spots
+
+
+def test_take_back_refreshes_account_summary(session, client, application):
+    """Taking back an approved application removes its rating from the applicant's statistics."""
+    application.status = ApplicationStatus.approved
+    # The hours only count once the project is finished, but the ratings count at once
+    session.add(VolunteeringReport(application_id=application.id,
+                                   reporter_email='creator@innopolis.university', rating=5))
+    refresh_account_summary(application.applicant_email)
+    session.commit()
+    assert AccountSummary.query.get(application.applicant_email).rating_count == 1
+    log_in(client, application.applicant)
+
+    response = client.delete(application_url(application))
+    assert response.status_code == 204
+
+    session.expire_all()
+    summary = AccountSummary.query.get('student@innopolis.university')
+    assert (summary.rating_sum, summary.rating_count) == (0, 0)
+
+
+def test_project_summary_follows_status(session, client, application):
+    """Approving an application takes a vacant spot and taking it back frees the spot."""
+    assert vacant_spots(session, application) == 3
+    log_in(client, application.activity.project.creator)
+
+    response = client.patch(f'{application_url(application)}/{application.id}',
+                            json={'status': 'approved'})
+    assert response.status_code == 200
+    assert vacant_spots(session, application) == 2
+
+    log_in(client, application.applicant)
+    response = client.delete(application_url(application))
+    assert response.status_code == 204
+    assert vacant_spots(session, application) == 3
+
+
+def test_search_escapes_wildcards(client, application):
+    """The wildcards in the search query are matched literally."""
+    # pylint: disable=unused-argument
+    def found(query):
+        response = client.get('/api/v1/projects', query_string={'q': query})
+        assert response.status_code == 200
+        return [project['name'] for project in response.get_json()]
+
+    assert found('campus') == ['Open Day']
+    assert found('100%') == ['Open Day']
+    # Both would match as patterns
+    assert found('Open%Day') == []
+    assert found('1_0%') == []
@@ -0,0 +1,58 @@
+"""Tests of the bulk balance changes."""
+
+import pytest
+
+from innopoints.models import Account, Transaction
+from innopoints.views.account import MAX_BULK_CHANGES
+
+from .conftest import log_in
+
+
+@pytest.fixture
+def admin(session, client):
+    """Log the client in as an admin."""
+    account = Account(email='admin@innopolis.university', full_name='Admin', is_admin=True)
+    session.add(account)
+    session.commit()
+    log_in(client, account)
+    return account
+
+
+def post_csv(client, text):
+    """Pass the changes to the bulk endpoint as CSV."""
+    return client.post('/api/v1/accounts/balance', data=text, content_type='text/csv')
+
+
+def test_too_many_changes(client, session, admin):
+    """More than MAX_BULK_CHANGES rows are rejected as a whole."""
+    rows = ''.join(f'{admin.email},1\n' for _ in range(MAX_BULK_CHANGES + 1))
+    response = post_csv(client, rows)
+    assert response.status_code == 400
+    assert session.query(Transaction).count() == 0
+
+    response = client.post('/api/v1/accounts/balance',
+                           json=[{'email': admin.email, 'change': 1}] * (MAX_BULK_CHANGES + 1))
+    assert response.status_code == 400
+    assert session.query(Transaction).count() == 0
+
+
+def test_malformed_rows(client, session, admin):
+    """The malformed rows are reported as invalid, the rest applied."""
+    response = post_csv(client, (f'email,change\n'
+                                 f'{admin.email},10\n'
+                                 f'{admin.email},ten\n'
+                                 f'{admin.email}\n'
+                                 f'{admin.email},1,2\n'
+                                 f',5\n'))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['applied'] == 1
+    assert [result['status'] for result in body['results']] == ['applied'] + ['invalid'] * 4
+    assert [transaction.change for transaction in session.query(Transaction)] == [10]
+
+
+def test_unparsable_csv(client, session, admin):
+    """A body the CSV reader gives up on is a bad request."""
+    response = post_csv(client, f'{admin.email},"{"1" * 200_000}"\n')
+    assert response.status_code == 400
+    assert session.query(Transaction).count() == 0
@@ -0,0 +1,55 @@
+"""Tests of the maintenance commands."""
+
+import sqlite3
+
+import pytest
+
+from innopoints.commands import import_legacy_command
+from innopoints.models import LegacyAccount
+
+LEGACY_ROWS = [
+    ('student@innopolis.university', '', 'pbkdf2\\sha256', 10),
+    (None, 'old.student', '', 5),
+    ('tabs@innopolis.university', 'tab\tand\nnewline', 'secret', 0),
+]
+
+
+@pytest.fixture
+def legacy_database(tmp_path):
+    """Create an SQLite database of the old system with the legacy rows."""
+    path = tmp_path / 'db.sqlite3'
+    connection = sqlite3.connect(str(path))
+    with connection:
+        connection.execute('CREATE TABLE User (email TEXT, username TEXT, password TEXT, '
+                           'points INTEGER)')
+        connection.executemany('INSERT INTO User VALUES (?, ?, ?, ?)', LEGACY_ROWS)
+    connection.close()
+    return str(path)
+
+
+def imported_rows(session):
+    """Return the rows of the legacy accounts table in the order of the legacy rows."""
+    rows = session.query(LegacyAccount.email, LegacyAccount.username,
+                         LegacyAccount.password, LegacyAccount.points).order_by(LegacyAccount.id)
+    result = [tuple(row) for row in rows]
+    # The command locks the table from its own connection
+    session.commit()
+    return result
+
+
+def test_import_legacy_replace(app, session, legacy_database):
+    """Importing again needs --replace, which keeps the empty strings and NULLs as they were."""
+    runner = app.test_cli_runner()
+    result = runner.invoke(import_legacy_command, [legacy_database])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 3 legacy accounts.' in result.output
+    assert imported_rows(session) == LEGACY_ROWS
+
+    result = runner.invoke(import_legacy_command, [legacy_database])
+    assert result.exit_code != 0
+    assert 'pass --replace' in result.output
+    assert imported_rows(session) == LEGACY_ROWS
+
+    result = runner.invoke(import_legacy_command, [legacy_database, '--replace'])
+    assert result.exit_code == 0, result.output
+    assert imported_rows(session) == LEGACY_ROWS
@@ -0,0 +1,36 @@
+"""Tests of the gunicorn and pool settings taken from the environment."""
+
+import os
+import runpy
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_settings(path):
+    """Execute the configuration file and return its settings."""
+    return runpy.run_path(os.path.join(ROOT_DIR, path))
+
+
+@pytest.mark.parametrize('environment, workers', [
+    ({}, 1),
+    ({'WEB_CONCURRENCY': '3'}, 3),
+    ({'WEB_CONCURRENCY': '3', 'GUNICORN_WORKERS': '2'}, 2),
+])
+def test_workers(monkeypatch, environment, workers):
+    """GUNICORN_WORKERS takes precedence over WEB_CONCURRENCY, which takes it over the default."""
+    for name in ('WEB_CONCURRENCY', 'GUNICORN_WORKERS'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in environment.items():
+        monkeypatch.setenv(name, value)
+    assert load_settings('gunicorn.conf.py')['workers'] == workers
+
+
+@pytest.mark.parametrize('worker_class, pool_size', [('sync', 5), ('gevent', 20)])
+def test_pool_size_for_worker_class(monkeypatch, worker_class, pool_size):
+    """The green workers get a larger pool, as each serves many requests at once."""
+    monkeypatch.delenv('DB_POOL_SIZE', raising=False)
+    monkeypatch.setenv('GUNICORN_WORKER_CLASS', worker_class)
+    settings = load_settings('innopoints/config/common.py')
+    assert settings['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'] == pool_size
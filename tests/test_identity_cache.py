@@ -0,0 +1,59 @@
+"""Tests of the cache of the authenticated users."""
+
+from sqlalchemy import event
+import pytest
+
+from innopoints.extensions import db
+from innopoints.models import Account
+from innopoints.models.account import _identity_cache
+
+from .conftest import log_in
+
+
+@pytest.fixture
+def user_cache(app):
+    """Enable the identity cache for the test."""
+    _identity_cache.clear()
+    app.config['USER_CACHE_TTL'] = 60
+    yield
+    app.config['USER_CACHE_TTL'] = 0
+    _identity_cache.clear()
+
+
+def count_queries(client, url):
+    """Return the response to a GET request and the number of statements it executed.
+    The request starts with an empty session, like in a worker."""
+    db.session.expunge_all()
+    statements = []
+
+    def record(_conn, _cursor, statement, _parameters, _context, _executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response, len(statements)
+
+
+def test_cached_user_skips_accounts_query(session, client, user_cache):
+    """A repeated request of the same user doesn't load the account again,
+    until the account changes."""
+    # pylint: disable=unused-argument
+    account = Account(email='admin@innopolis.university', full_name='Admin', is_admin=True)
+    session.add(account)
+    session.commit()
+    log_in(client, account)
+
+    response, cold_queries = count_queries(client, '/api/v1/account/timeline')
+    assert response.status_code == 200
+    response, warm_queries = count_queries(client, '/api/v1/account/timeline')
+    assert response.status_code == 200
+    assert warm_queries == cold_queries - 1
+
+    Account.query.get(account.email).is_admin = False
+    session.commit()
+    _response, changed_queries = count_queries(client, '/api/v1/account/timeline')
+    assert changed_queries == cold_queries
+    assert _identity_cache[account.email][1]['is_admin'] is False
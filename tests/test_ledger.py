@@ -0,0 +1,68 @@
+"""Tests of the balances at a point in time."""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from innopoints.core.ledger import balance_as_of, balances_as_of, make_checkpoints
+from innopoints.core.timezone import tz_aware_now
+from innopoints.extensions import db
+from innopoints.models import (
+    Account,
+    Product,
+    StockChange,
+    StockChangeStatus,
+    Transaction,
+    Variety,
+)
+
+
+def test_rejected_purchase_after_checkpoint(session):
+    """Rejecting a purchase made before a checkpoint doesn't leave its debit in the balance."""
+    account = Account(email='student@innopolis.university', full_name='Student', is_admin=False)
+    variety = Variety(product=Product(name='Mug', description='A mug', price=100))
+    purchase = StockChange(amount=-1, status=StockChangeStatus.pending,
+                           account=account, variety=variety)
+    purchase.transaction = Transaction(account=account, change=-100)
+    session.add_all([account, purchase, Transaction(account=account, change=500)])
+    session.commit()
+
+    make_checkpoints(tz_aware_now())
+    session.commit()
+    assert balance_as_of(account.email, tz_aware_now()) == account.balance == 400
+
+    # The same as rejecting the purchase in edit_purchase_status
+    session.delete(purchase.transaction)
+    purchase.status = StockChangeStatus.rejected
+    session.commit()
+
+    assert balance_as_of(account.email, tz_aware_now()) == account.balance == 500
+
+
+def test_balances_match_full_history(session):
+    """The balances summed up from the checkpoints equal the sums of the whole ledger."""
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    accounts = [Account(email=f'student{number}@innopolis.university',
+                        full_name=f'Student {number}', is_admin=False)
+                for number in range(3)]
+    session.add_all(accounts)
+    # The last account has no transactions at all
+    for day in range(10):
+        for number, account in enumerate(accounts[:2]):
+            session.add(Transaction(account=account, change=(day + 1) * (number + 1) * 10,
+                                    time=start + timedelta(days=day)))
+    session.commit()
+
+    make_checkpoints(start + timedelta(days=3))
+    make_checkpoints(start + timedelta(days=6, hours=12))
+    session.commit()
+
+    for moment in (start - timedelta(days=1), start, start + timedelta(days=3),
+                   start + timedelta(days=5), start + timedelta(days=7), tz_aware_now()):
+        full_history = dict(session.query(Account.email, db.func.coalesce(
+            db.func.sum(Transaction.change).filter(Transaction.time <= moment), 0
+        )).outerjoin(Transaction).group_by(Account.email))
+        balances = balances_as_of(moment).alias('balances')
+        from_checkpoints = dict(session.execute(
+            select([balances.c.account_email, balances.c.balance])).fetchall())
+        assert from_checkpoints == full_history
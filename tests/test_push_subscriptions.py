@@ -0,0 +1,53 @@
+"""Tests of the validation of the push subscriptions."""
+
+import pytest
+
+from innopoints.models import Account, PushSubscription
+
+from .conftest import log_in
+
+
+@pytest.fixture
+def student(session, client):
+    """Log the client in as a student with a push subscription."""
+    account = Account(email='student@innopolis.university', full_name='Student', is_admin=False)
+    session.add(account)
+    session.flush()
+    session.add(PushSubscription(endpoint='https://push.example/1', account_email=account.email,
+                                 p256dh='key', auth='secret'))
+    session.commit()
+    log_in(client, account)
+    return account
+
+
+@pytest.mark.parametrize('subscription', [
+    {'endpoint': 'https://push.example/2', 'keys': {'p256dh': 'k' * 129, 'auth': 'secret'}},
+    {'endpoint': 'https://push.example/2', 'keys': {'p256dh': 'key', 'auth': 's' * 65}},
+    {'endpoint': ['https://push.example/2'], 'keys': {'p256dh': 'key', 'auth': 'secret'}},
+    {'endpoint': 'https://push.example/2', 'keys': 'key'},
+    ['https://push.example/2'],
+])
+def test_invalid_subscription_rejected(client, student, subscription):
+    """A subscription that doesn't fit the table is rejected without storing anything."""
+    # pylint: disable=unused-argument
+    response = client.post('/api/v1/notifications/subscribe', json=subscription)
+    assert response.status_code == 400
+    assert PushSubscription.query.count() == 1
+
+
+@pytest.mark.parametrize('body', [[], 'https://push.example/1', 1])
+def test_unsubscribe_non_object_rejected(client, student, body):
+    """Unsubscribing with a JSON body that isn't an object is a bad request."""
+    # pylint: disable=unused-argument
+    response = client.delete('/api/v1/notifications/subscribe', json=body)
+    assert response.status_code == 400
+    assert PushSubscription.query.count() == 1
+
+
+def test_unsubscribe(client, student):
+    """Unsubscribing removes the subscription with the given endpoint."""
+    # pylint: disable=unused-argument
+    response = client.delete('/api/v1/notifications/subscribe',
+                             json={'endpoint': 'https://push.example/1'})
+    assert response.status_code == 204
+    assert PushSubscription.query.count() == 0
@@ -0,0 +1,60 @@
+"""Tests of routing the reads of the read-only views to the replica."""
+
+import time
+
+from flask import g, session as flask_session
+
+from innopoints.extensions import db
+from innopoints.models import Account, Notification, NotificationType
+
+from .conftest import log_in
+
+
+def test_safe_view_reads_from_replica(app, replica):
+    """Only the reads of the replica-safe views go to the replica."""
+    with app.app_context(), app.test_request_context():
+        assert db.session.get_bind() is not replica
+        g.replica_safe = True
+        assert db.session.get_bind() is replica
+
+
+def test_write_sticks_to_primary(app, session, replica):
+    """A request goes to the primary after it writes, and so does the client
+    until the replica lag window passes."""
+    # Each request has an application context, and thus `g`, of its own
+    with app.app_context(), app.test_request_context():
+        g.replica_safe = True
+        session.add(Account(email='student@innopolis.university', full_name='Student',
+                            is_admin=False))
+        session.commit()
+        assert g.db_written
+        assert db.session.get_bind() is not replica
+        assert flask_session['primary_until'] > time.time()
+        primary_until = flask_session['primary_until']
+
+    with app.app_context(), app.test_request_context():
+        g.replica_safe = True
+        flask_session['primary_until'] = primary_until
+        assert db.session.get_bind() is not replica
+        flask_session['primary_until'] = time.time() - 1
+        assert db.session.get_bind() is replica
+
+
+def test_client_pinned_after_write(client, session, replica):
+    """The pin to the primary is kept in the session of the client that wrote."""
+    # pylint: disable=unused-argument
+    account = Account(email='student@innopolis.university', full_name='Student', is_admin=False)
+    session.add(account)
+    session.flush()
+    notification = Notification(recipient_email=account.email, type=NotificationType.service,
+                                payload={'message': 'Hello'})
+    session.add(notification)
+    session.commit()
+    log_in(client, account)
+
+    with client.session_transaction() as client_session:
+        assert 'primary_until' not in client_session
+    response = client.patch(f'/api/v1/notifications/{notification.id}/read')
+    assert response.status_code == 204
+    with client.session_transaction() as client_session:
+        assert client_session['primary_until'] > time.time()
@@ -0,0 +1,60 @@
+"""Tests of the cache of schema instances."""
+
+import threading
+import time
+
+from innopoints.models import Account
+from innopoints.schemas import AccountSchema, ProjectSchema, get_schema, schema_context
+
+LISTING_EXCLUDE = ['admin_feedback', 'files', 'lifetime_stage'] + [
+    f'activities.{field}' for field in ('description', 'telegram_required', 'fixed_reward',
+                                        'working_hours', 'reward_rate', 'people_required',
+                                        'application_deadline', 'project', 'applications',
+                                        'existing_application', 'feedback_questions')
+]
+
+
+def test_same_instance_for_same_options():
+    """The options are normalized, so the same combination returns the same instance."""
+    schema = get_schema(AccountSchema, many=True, only=('email', 'full_name'))
+    assert get_schema(AccountSchema, many=True, only=['full_name', 'email']) is schema
+    assert get_schema(AccountSchema, only=('email', 'full_name')) is not schema
+
+
+def test_context_per_thread():
+    """Threads dumping with the same cached schema at once each see their own context."""
+    schema = get_schema(AccountSchema, only=('email', 'csrf_token'))
+    account = Account(email='student@innopolis.university')
+    barrier = threading.Barrier(2)
+    dumps = {}
+
+    def dump(token):
+        with schema_context(csrf_token=token):
+            barrier.wait()
+            dumps[token] = schema.dump(account)
+
+    threads = [threading.Thread(target=dump, args=(token,)) for token in ('first', 'second')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert dumps['first']['csrf_token'] == 'first'
+    assert dumps['second']['csrf_token'] == 'second'
+    assert schema.dump(account)['csrf_token'] is None
+
+
+def test_cached_schema_faster():
+    """Benchmark: dumping with the cached listing schema is faster than building it each time."""
+    def best_time(dump, repeat=20):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            dump()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    built = best_time(lambda: ProjectSchema(many=True, exclude=LISTING_EXCLUDE).dump([]))
+    cached = best_time(lambda: get_schema(ProjectSchema, many=True,
+                                          exclude=LISTING_EXCLUDE).dump([]))
+    assert cached < built
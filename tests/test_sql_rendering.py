@@ -0,0 +1,65 @@
+"""Tests that the listings rendered by the database match the ones of the schemas."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from innopoints.core.statistics import refresh_project_summary
+from innopoints.models import (
+    Account,
+    Activity,
+    Application,
+    ApplicationStatus,
+    Competence,
+    LifetimeStage,
+    Product,
+    Project,
+    StockChange,
+    StockChangeStatus,
+    Variety,
+)
+
+
+@pytest.fixture
+def listings(session):
+    """Fill the database with a project and a product with everything the listings show."""
+    creator = Account(email='creator@innopolis.university', full_name='Creator', is_admin=False)
+    student = Account(email='student@innopolis.university', full_name='Student', is_admin=False)
+    start = datetime(2020, 9, 1, 10, 0, tzinfo=timezone.utc)
+
+    project = Project(name='Open Day', creator=creator, moderators=[creator],
+                      lifetime_stage=LifetimeStage.ongoing)
+    limited = Activity(name='Guide', description='Show the campus', draft=False,
+                       start_date=start, end_date=start + timedelta(hours=2, microseconds=1500),
+                       people_required=3, competences=[Competence(name='Communication')])
+    limited.applications.append(Application(applicant=student, actual_hours=1,
+                                            status=ApplicationStatus.approved))
+    unlimited = Activity(name='Cleanup', draft=False, start_date=start + timedelta(days=1),
+                         end_date=start + timedelta(days=1, hours=1))
+    project.activities.extend([limited, unlimited])
+
+    product = Product(name='Hoodie', type='clothes', description='Warm', price=500)
+    variety = Variety(product=product)
+    variety.stock_changes.extend([
+        StockChange(amount=10, status=StockChangeStatus.carried_out, account=creator),
+        StockChange(amount=-1, status=StockChangeStatus.pending, account=student),
+    ])
+
+    session.add_all([creator, student, project, product])
+    session.flush()
+    refresh_project_summary(project.id)
+    session.commit()
+
+
+@pytest.mark.parametrize('url', ['/api/v1/projects', '/api/v1/products'])
+def test_renderers_match(app, listings, url):  # pylint: disable=unused-argument
+    """Both renderers produce the same bytes for the same rows."""
+    documents = {}
+    for renderer in ('marshmallow', 'sql'):
+        app.config['LISTING_RENDERER'] = renderer
+        with app.test_client() as client:
+            response = client.get(url)
+        assert response.status_code == 200
+        documents[renderer] = response.get_data()
+
+    assert documents['sql'] == documents['marshmallow']
@@ -0,0 +1,76 @@
+"""Tests of the cost of starting the application."""
+
+import os
+import subprocess
+import sys
+import time
+
+# Seconds that importing run.py (which creates the app) may take, including the interpreter noise
+IMPORT_TIME_LIMIT = float(os.environ.get('IMPORT_TIME_LIMIT', 2))
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Nothing listens on this port, so the connections are refused at once
+UNREACHABLE_DATABASE_URL = 'postgresql://localhost:1/innopoints'
+
+
+def import_times(statement='import run'):
+    """Run the statement with `-X importtime` in a fresh interpreter.
+    Return the cumulative import time in microseconds of each imported module."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT_DIR,
+        env={**os.environ, 'FLASK_ENV': 'development'},
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _self_time, cumulative, module = line[len('import time:'):].split('|')
+        times.setdefault(module.strip(), int(cumulative))
+    return times
+
+
+def test_import_time_within_limit():
+    """Importing run.py stays under the limit."""
+    times = import_times()
+    assert times['run'] < IMPORT_TIME_LIMIT * 1_000_000
+
+
+def test_heavy_dependencies_deferred():
+    """The image processing library is only imported when an image is processed."""
+    assert 'PIL' not in import_times()
+
+
+def run_with_unreachable_database(*args):
+    """Run the command against a database that refuses connections.
+    Return the completed process and the seconds it took."""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        args,
+        cwd=ROOT_DIR,
+        env={**os.environ, 'FLASK_ENV': 'development', 'FLASK_APP': 'run.py',
+             'DATABASE_URL': UNREACHABLE_DATABASE_URL},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    return completed, time.perf_counter() - start
+
+
+def test_cold_start_without_database():
+    """Creating the app neither waits for the database nor migrates it."""
+    completed, elapsed = run_with_unreachable_database(
+        sys.executable, '-c', 'import run; print(run.app.name)')
+    assert completed.returncode == 0, completed.stderr
+    assert elapsed < IMPORT_TIME_LIMIT
+
+
+def test_migrate_gives_up_on_unreachable_database():
+    """The migrate command fails with a message once the database doesn't come up in time."""
+    completed, elapsed = run_with_unreachable_database(
+        sys.executable, '-m', 'flask', 'migrate', '--timeout', '0')
+    assert completed.returncode != 0
+    assert 'The database is unreachable' in completed.stderr
+    assert elapsed < IMPORT_TIME_LIMIT + 1
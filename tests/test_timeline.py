@@ -0,0 +1,52 @@
+"""Tests of the keyset pagination of the account timeline."""
+
+from datetime import datetime, timedelta, timezone
+
+from innopoints.models import Account, LifetimeStage, Project, TimelineEvent, TimelineEventType
+
+from .conftest import log_in
+
+
+def test_cursor_round_trip(session, client):
+    """Following the cursors yields every event once, in the order of a single page."""
+    account = Account(email='creator@innopolis.university', full_name='Creator', is_admin=False)
+    project = Project(name='Open Day', creator=account, lifetime_stage=LifetimeStage.ongoing)
+    start = datetime(2020, 9, 1, 10, 0, tzinfo=timezone.utc)
+    # Several events share the time, so the pages are also split between equal times
+    for offset in (0, 1, 1, 1, 2, 3, 3):
+        session.add(TimelineEvent(type=TimelineEventType.project, account=account,
+                                  project=project, entry_time=start + timedelta(hours=offset)))
+    session.add_all([account, project])
+    session.commit()
+    log_in(client, account)
+
+    response = client.get('/api/v1/account/timeline?limit=100')
+    assert response.status_code == 200
+    single_page = response.get_json()
+    assert len(single_page['data']) == 7
+    assert single_page['next_cursor'] is None
+    assert not single_page['more']
+
+    pages = []
+    url = '/api/v1/account/timeline?limit=2'
+    while True:
+        page = client.get(url).get_json()
+        pages.append(page)
+        if page['next_cursor'] is None:
+            break
+        assert page['more']
+        url = f'/api/v1/account/timeline?limit=2&cursor={page["next_cursor"]}'
+
+    assert [len(page['data']) for page in pages] == [2, 2, 2, 1]
+    assert [event for page in pages for event in page['data']] == single_page['data']
+
+
+def test_invalid_cursor(session, client):
+    """A cursor that can't be decoded is a bad request."""
+    account = Account(email='student@innopolis.university', full_name='Student', is_admin=False)
+    session.add(account)
+    session.commit()
+    log_in(client, account)
+
+    response = client.get('/api/v1/account/timeline?cursor=garbage')
+    assert response.status_code == 400
@@ -0,0 +1,59 @@
+"""Tests of the statement timeouts of the views."""
+
+from flask import jsonify
+from flask_login import login_required
+import pytest
+
+from innopoints.core.replica import replica_safe
+from innopoints.core.timeouts import statement_timeout
+from innopoints.extensions import db
+from innopoints.models import Account
+
+from .conftest import log_in
+
+TIMEOUT = 100  # ms
+
+
+@pytest.fixture(scope='module')
+def slow_views(app):
+    """Register views that sleep in the database for the given number of milliseconds,
+    one reading from the primary and one allowed to read from the replica."""
+    @login_required
+    @statement_timeout(TIMEOUT)
+    def sleep(milliseconds):
+        timeout = db.session.execute('SHOW statement_timeout').scalar()
+        db.session.execute(db.text('SELECT pg_sleep(:seconds)'), {'seconds': milliseconds / 1000})
+        return jsonify(timeout)
+
+    app.add_url_rule('/test/sleep/<int:milliseconds>', 'test_sleep', sleep)
+    app.add_url_rule('/test/replica-sleep/<int:milliseconds>', 'test_replica_sleep',
+                     replica_safe(sleep))
+
+
+@pytest.fixture
+def logged_in(session, client):
+    """Log the client in, so the account is loaded before the view runs."""
+    account = Account(email='student@innopolis.university', full_name='Student', is_admin=False)
+    session.add(account)
+    session.commit()
+    log_in(client, account)
+    # The request has to begin its own transactions, as it does in a worker
+    session.close()
+
+
+@pytest.mark.parametrize('url', ['/test/sleep', '/test/replica-sleep'])
+def test_quick_statement(client, slow_views, logged_in, replica, url):
+    """The statements of the view run with its timeout, on the replica too."""
+    # pylint: disable=unused-argument
+    response = client.get(f'{url}/0')
+    assert response.status_code == 200
+    assert response.get_json() == f'{TIMEOUT}ms'
+
+
+@pytest.mark.parametrize('url', ['/test/sleep', '/test/replica-sleep'])
+def test_slow_statement_canceled(client, slow_views, logged_in, replica, url):
+    """A statement running past the timeout is canceled and the request answered with 503,
+    on the replica too."""
+    # pylint: disable=unused-argument
+    response = client.get(f'{url}/{TIMEOUT * 10}')
+    assert response.status_code == 503